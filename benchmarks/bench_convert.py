@@ -0,0 +1,51 @@
+"""
+Converting query results to Pandas and Python
+"""
+
+from rdflib import URIRef
+
+from gastrodon import LocalEndpoint, RemoteEndpoint
+
+from .common import SCALES, SELECT_ALL, EX, make_graph, prefix_graph
+
+class DataFrameConversion:
+    params=SCALES
+    param_names=["rows"]
+
+    def setup(self,rows):
+        self.endpoint=LocalEndpoint(make_graph(rows))
+        self.result=self.endpoint.select_raw(SELECT_ALL)
+
+    def time_dataframe(self,rows):
+        # a fresh endpoint each time so the URI cache starts out empty,  as it does for a new query
+        LocalEndpoint(self.endpoint.graph)._dataframe(self.result)
+
+    def time_dataframe_warm(self,rows):
+        self.endpoint._dataframe(self.result)
+
+    def peakmem_dataframe(self,rows):
+        self.endpoint._dataframe(self.result)
+
+class ToPython:
+    params=SCALES
+    param_names=["rows"]
+
+    def setup(self,rows):
+        self.endpoint=RemoteEndpoint("http://127.0.0.1:1/sparql",prefix_graph())
+        self.uris=[EX["thing%d" % i] for i in range(rows)]
+        self.foreign=[URIRef("http://example.org/thing%d" % i) for i in range(rows)]
+
+    def time_shorten_uri(self,rows):
+        convert=self.endpoint._convert_uri
+        for uri in self.uris:
+            convert(uri)
+
+    def time_to_python_cached(self,rows):
+        to_python=self.endpoint.to_python
+        for uri in self.uris:
+            to_python(uri)
+
+    def time_unknown_namespace(self,rows):
+        convert=self.endpoint._convert_uri
+        for uri in self.foreign:
+            convert(uri)
@@ -0,0 +1,66 @@
+"""
+Moving structures between graphs and Python:  peel,  decollect,  inline and ttl
+"""
+
+import os
+
+import gastrodon
+from gastrodon import LocalEndpoint, RemoteEndpoint, inline, ttl
+
+from .common import SCALES, EX, stand_in_server, make_graph, prefix_graph
+
+class Peel:
+    params=[10,100]
+    param_names=["records"]
+
+    def setup(self,records):
+        self.server=stand_in_server(1000)
+        self.endpoint=RemoteEndpoint(self.server.url,prefix_graph())
+        self.records=[EX["record%d" % i] for i in range(records)]
+        self.time_peel(records)
+        self.time_peel_many(records)
+
+    def teardown(self,records):
+        self.endpoint.close()
+
+    def time_peel(self,records):
+        for record in self.records:
+            self.endpoint.peel(record)
+
+    def time_peel_many(self,records):
+        self.endpoint.peel_many(self.records)
+
+class Decollect:
+    params=[10,100]
+    param_names=["containers"]
+
+    def setup(self,containers):
+        self.endpoint=LocalEndpoint(make_graph(1000))
+        self.containers=[EX["container%d" % i] for i in range(containers)]
+
+    def time_decollect(self,containers):
+        for container in self.containers:
+            self.endpoint.decollect(container)
+
+    def time_decollect_many(self,containers):
+        self.endpoint.decollect_many(self.containers)
+
+class Turtle:
+    params=SCALES[:2]
+    param_names=["rows"]
+
+    def setup(self,rows):
+        self.graph=make_graph(rows)
+        self.text=self.graph.serialize(format="turtle")
+        self.stdout=gastrodon.stdout
+        gastrodon.stdout=open(os.devnull,"wb")
+
+    def teardown(self,rows):
+        gastrodon.stdout.close()
+        gastrodon.stdout=self.stdout
+
+    def time_inline(self,rows):
+        inline(self.text)
+
+    def time_ttl(self,rows):
+        ttl(self.graph)
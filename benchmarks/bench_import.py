@@ -0,0 +1,35 @@
+"""
+The time "import gastrodon" takes,  which short-lived scripts and worker processes pay before doing anything
+"""
+
+import subprocess
+import sys
+
+# subsystems that are only imported when something uses them
+DEFERRED=["IPython","SPARQLWrapper","pyparsing","rdflib.plugins.sparql","rdflib.plugins.serializers.turtle",
+            "asyncio","multiprocessing"]
+
+class Import:
+    # each timeraw benchmark runs in a fresh interpreter,  so nothing is imported already
+    def timeraw_import(self):
+        return "import gastrodon"
+
+    def timeraw_import_dependencies(self):
+        # the part of the import time that belongs to pandas and rdflib themselves
+        return "import pandas, rdflib"
+
+    def timeraw_first_local_select(self):
+        # importing the SPARQL engine is put off until the first query,  which pays for it here instead
+        return """
+endpoint.select("SELECT ?s ?o { ?s ex:p ?o }")
+""","""
+import gastrodon
+endpoint = gastrodon.inline("@prefix ex: <http://example.com/> . ex:s ex:p 1 .")
+"""
+
+    def track_deferred_loaded(self):
+        # the number of deferred subsystems that "import gastrodon" loads anyway;  it should stay at 0
+        check="import sys, gastrodon; print(sum(name in sys.modules for name in %r))" % DEFERRED
+        return int(subprocess.check_output([sys.executable,"-c",check]))
+
+    track_deferred_loaded.unit="modules"
@@ -0,0 +1,155 @@
+"""
+Preparing query text and running SELECT queries
+"""
+
+import shutil
+import tempfile
+
+from rdflib import Graph, URIRef
+
+from gastrodon import LocalEndpoint, RemoteEndpoint, QName, DiskCache, ArrayStore
+from gastrodon import _prepare
+
+from .common import SCALES, SELECT_ALL, EX, stand_in_server, make_graph, prefix_graph
+
+TEMPLATE="""
+    SELECT ?s ?label {
+        ?s a ?_type ;
+           rdfs:label ?label ;
+           ex:count ?_count ;
+           ex:knows ?_friend .
+        FILTER(?label != ?_name)
+    }
+"""
+
+SELECT_VALUES="SELECT ?_thing ?label { ?_thing rdfs:label ?label }"
+
+# a join that rdflib matches one solution at a time
+SELECT_JOIN="SELECT ?s ?o { ?s ex:knows ?o . ?o ex:knows ?s }"
+
+class QueryText:
+    def setup(self):
+        self.endpoint=RemoteEndpoint("http://127.0.0.1:1/sparql",prefix_graph())
+        self.prepared=_prepare(TEMPLATE)
+        self.bindings={
+            "_type":QName("ex:Thing"),
+            "_count":42,
+            "_friend":URIRef("http://example.com/thing7"),
+            "_name":"Thing number 7",
+        }
+        self.template=self.endpoint._prepare_query(TEMPLATE)
+        self.values_template=self.endpoint._prepare_query(SELECT_VALUES)
+        self.things={"_thing":[EX["thing%d" % i] for i in range(1000)]}
+
+    def time_prepend_namespaces(self):
+        self.endpoint._prepend_namespaces(self.prepared)
+
+    def time_substitute_arguments(self):
+        self.endpoint._substitute_arguments(self.template,self.bindings,self.endpoint.prefixes)
+
+    def time_substitute_values(self):
+        # a list of 1000 URIs written as a VALUES block
+        self.endpoint._substitute_arguments(self.values_template,self.things,self.endpoint.prefixes)
+
+    def time_prepare_new_query(self):
+        # a query that was never seen before has to be parsed
+        _prepare.cache_clear()
+        _prepare(TEMPLATE)
+
+class LocalSelect:
+    params=SCALES[:2]
+    param_names=["rows"]
+    timeout=300
+
+    def setup(self,rows):
+        self.endpoint=LocalEndpoint(make_graph(rows))
+
+    def time_select(self,rows):
+        self.endpoint.select(SELECT_ALL)
+
+    def time_select_one(self,rows):
+        thing=URIRef("http://example.com/thing7")
+        self.endpoint.select("SELECT ?label { ?_thing rdfs:label ?label }")
+
+    def time_select_join(self,rows):
+        self.endpoint.select(SELECT_JOIN)
+
+class ArrayStoreSelect:
+    params=SCALES[:2]
+    param_names=["rows"]
+    timeout=300
+
+    def setup(self,rows):
+        graph=Graph(store=ArrayStore())
+        graph+=make_graph(rows)
+        self.endpoint=LocalEndpoint(graph,prefix_graph())
+        # the indexes are sorted on the first read,  which is not what is being timed
+        self.endpoint.select(SELECT_JOIN)
+
+    def time_select(self,rows):
+        self.endpoint.select(SELECT_ALL)
+
+    def time_select_join(self,rows):
+        self.endpoint.select(SELECT_JOIN)
+
+    def peakmem_load(self,rows):
+        graph=Graph(store=ArrayStore())
+        graph+=make_graph(rows)
+        len(graph)
+
+class RemoteSelect:
+    params=(SCALES,["json","tsv","csv","xml"])
+    param_names=["rows","result_format"]
+    timeout=300
+
+    def setup(self,rows,result_format):
+        self.server=stand_in_server(rows)
+        self.endpoint=RemoteEndpoint(self.server.url,prefix_graph(),result_format=result_format)
+        # the server remembers its answer,  so the timings below measure the client
+        self.endpoint.select(SELECT_ALL)
+
+    def teardown(self,rows,result_format):
+        self.endpoint.close()
+
+    def time_select(self,rows,result_format):
+        self.endpoint.select(SELECT_ALL)
+
+    def peakmem_select(self,rows,result_format):
+        self.endpoint.select(SELECT_ALL)
+
+class RemoteSelectDiskCache:
+    params=SCALES
+    param_names=["rows"]
+    timeout=300
+
+    def setup(self,rows):
+        self.server=stand_in_server(rows)
+        self.directory=tempfile.mkdtemp()
+        self.endpoint=RemoteEndpoint(self.server.url,prefix_graph(),disk_cache=DiskCache(self.directory))
+        # the result is fetched once and then read back from the Parquet file,  as on re-running a notebook
+        self.endpoint.select(SELECT_ALL)
+
+    def teardown(self,rows):
+        self.endpoint.close()
+        shutil.rmtree(self.directory,ignore_errors=True)
+
+    def time_select_cached(self,rows):
+        self.endpoint.select(SELECT_ALL)
+
+class RemoteSelectValues:
+    params=SCALES
+    param_names=["values"]
+    timeout=300
+
+    def setup(self,values):
+        self.server=stand_in_server(values)
+        self.endpoint=RemoteEndpoint(self.server.url,prefix_graph())
+        self.things=[EX["thing%d" % i] for i in range(values)]
+        # the server remembers its answer to each batch,  so the timings below measure the client
+        self.endpoint.select(SELECT_VALUES,bindings={"_thing":self.things})
+
+    def teardown(self,values):
+        self.endpoint.close()
+
+    def time_select_values(self,values):
+        self.endpoint.select(SELECT_VALUES,bindings={"_thing":self.things})
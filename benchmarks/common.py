@@ -0,0 +1,202 @@
+"""
+Synthetic graphs and a stand-in SPARQL server shared by the benchmarks.
+
+The graphs are generated from a fixed pattern,  so every run (and every commit) measures the same data.
+"""
+
+import io
+import json
+import re
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from rdflib import Graph, URIRef, Literal, BNode, RDF, RDFS, Namespace
+
+EX=Namespace("http://example.com/")
+
+SCALES=[1000,10000,100000]
+
+PREFIXES="""
+    @prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+    @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+    @prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+    @prefix ex: <http://example.com/> .
+    ex:prefixes rdfs:label "prefixes" .
+"""
+
+SELECT_ALL="""
+    SELECT ?s ?label ?count ?knows {
+        ?s a ex:Thing ;
+           rdfs:label ?label ;
+           ex:count ?count ;
+           ex:knows ?knows
+    }
+"""
+
+_graphs={}
+_servers={}
+
+def prefix_graph():
+    graph=Graph()
+    graph.parse(data=PREFIXES,format="turtle")
+    return graph
+
+def make_graph(rows):
+    """
+    A graph of `rows` things,  each with a label,  a count and a link to another thing,  plus rows/10 containers
+    (alternately rdf:Seq and rdf:Bag) and rows/10 records made of nested blank nodes.  Graphs are built once per
+    process and shared,  so they must not be modified.
+
+    :param rows: number of things
+    :return: rdflib Graph
+    """
+    if rows in _graphs:
+        return _graphs[rows]
+
+    graph=prefix_graph()
+    for i in range(rows):
+        thing=EX["thing%d" % i]
+        graph.add((thing,RDF.type,EX.Thing))
+        graph.add((thing,RDFS.label,Literal("Thing number %d" % i)))
+        graph.add((thing,EX["count"],Literal(i%97+1)))
+        graph.add((thing,EX.knows,EX["thing%d" % ((i*7919)%rows)]))
+
+    for i in range(rows//10):
+        container=EX["container%d" % i]
+        graph.add((container,RDF.type,RDF.Seq if i%2 else RDF.Bag))
+        for j in range(10):
+            graph.add((container,RDF["_%d" % (j+1)],EX["thing%d" % ((i+j)%rows)]))
+
+        record=EX["record%d" % i]
+        address=BNode()
+        graph.add((record,EX.address,address))
+        graph.add((address,EX.street,Literal("%d Main Street" % i)))
+        point=BNode()
+        graph.add((address,EX.location,point))
+        graph.add((point,EX.latitude,Literal(i/1000.0)))
+        graph.add((point,EX.longitude,Literal(-i/1000.0)))
+
+    _graphs[rows]=graph
+    return graph
+
+_content_types={
+    "json":"application/sparql-results+json",
+    "xml":"application/sparql-results+xml",
+    "csv":"text/csv",
+    "tsv":"text/tab-separated-values",
+    "nt":"application/n-triples",
+}
+
+_genid="https://rdflib.github.io/.well-known/genid/rdflib/"
+
+def _json_term(term):
+    if isinstance(term,URIRef) and term.startswith(_genid):
+        return {"type":"bnode","value":"nodeID://"+term[len(_genid):]}
+    if isinstance(term,URIRef):
+        return {"type":"uri","value":str(term)}
+    value={"type":"literal","value":str(term)}
+    if term.datatype:
+        value["datatype"]=str(term.datatype)
+    if term.language:
+        value["xml:lang"]=term.language
+    return value
+
+def _tsv_term(term):
+    if term is None:
+        return ""
+    if isinstance(term,URIRef) and term.startswith(_genid):
+        return "_:"+term[len(_genid):]
+    # n3() escapes line breaks and quotes but leaves tabs,  which TSV writes as \t
+    return term.n3().replace("\t","\\t")
+
+def _tsv_result(result):
+    lines=["\t".join("?"+str(x) for x in result.vars)]
+    lines+=["\t".join(_tsv_term(row[x]) for x in result.vars) for row in result]
+    return ("\n".join(lines)+"\n").encode("utf-8")
+
+class StandInServer:
+    """
+    A SPARQL protocol server on localhost that answers queries against an rdflib graph.  Answers are remembered,
+    so once a benchmark has run its query in `setup` the timings measure the client and not rdflib on the server.
+
+    Like Virtuoso,  the server writes blank nodes in JSON results as ``nodeID://`` names and accepts
+    ``<nodeID://...>`` in queries to refer to them,  so :meth:`RemoteEndpoint.peel` can follow them.
+
+    :param graph: Graph to answer queries from
+    """
+    def __init__(self,graph):
+        self.graph=graph.skolemize()
+        self.answers={}
+        self.lock=threading.Lock()
+        server=self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version="HTTP/1.1"
+            disable_nagle_algorithm=True
+
+            def _answer(self):
+                body=self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                params=urllib.parse.parse_qs(body or urllib.parse.urlsplit(self.path).query)
+                (content_type,data)=server.answer(params["query"][0],self.headers.get("Accept",""))
+                self.send_response(200)
+                self.send_header("Content-Type",content_type)
+                self.send_header("Content-Length",str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET=_answer
+            do_POST=_answer
+
+            def log_message(self,*args):
+                pass
+
+        self.httpd=ThreadingHTTPServer(("127.0.0.1",0),Handler)
+        self.url="http://127.0.0.1:%d/sparql" % self.httpd.server_port
+        threading.Thread(target=self.httpd.serve_forever,daemon=True).start()
+
+    def answer(self,query,accept):
+        # rdflib's SPARQL parser is not safe to use from several threads at once,  so queries are answered one at a
+        # time
+        key=(query,accept)
+        with self.lock:
+            if key not in self.answers:
+                self.answers[key]=self._evaluate(query,accept)
+            return self.answers[key]
+
+    def _evaluate(self,query,accept):
+        result=self.graph.query(re.sub("<nodeID://([^>]*)>",lambda m:"<%s%s>" % (_genid,m.group(1)),query))
+        preferred=accept.split(",")[0]
+        format="json"
+        for (name,content_type) in _content_types.items():
+            if content_type in preferred:
+                format=name
+        if result.type in ("CONSTRUCT","DESCRIBE"):
+            format="nt"
+            data=result.graph.serialize(format="nt",encoding="utf-8")
+        elif format=="tsv":
+            data=_tsv_result(result)
+        elif format=="json":
+            data=json.dumps({
+                "head":{"vars":[str(x) for x in result.vars]},
+                "results":{"bindings":[{str(k):_json_term(v) for (k,v) in row.asdict().items()} for row in result]}
+            }).encode()
+        else:
+            buffer=io.BytesIO()
+            result.serialize(buffer,format=format)
+            data=buffer.getvalue()
+
+        return (_content_types[format],data)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def stand_in_server(rows):
+    """
+    :param rows: number of things in the graph,  as for :func:`make_graph`
+    :return: a :class:`StandInServer` for that graph,  shared by the benchmarks run in this process
+    """
+    if rows not in _servers:
+        _servers[rows]=StandInServer(make_graph(rows))
+    return _servers[rows]
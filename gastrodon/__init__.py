@@ -2,31 +2,59 @@
 Gastrodon module header
 '''
 
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+import http.client
+import io
+import json
+import math
+import mmap
+import os
 import re
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+import weakref
 from abc import ABCMeta, abstractmethod
+from array import array
 from collections import OrderedDict, Counter
 from collections import deque
-from functools import lru_cache
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import count
 from sys import stdout,_getframe
 from types import FunctionType,LambdaType,GeneratorType,CoroutineType,FrameType,CodeType,MethodType
 from types import BuiltinFunctionType,BuiltinMethodType,DynamicClassAttribute,ModuleType,AsyncGeneratorType
-from typing import Dict,Match
-from urllib.error import HTTPError
-from urllib.parse import urlparse
+from typing import Dict,Match,TYPE_CHECKING
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urljoin, urlparse, urlsplit
 
+import numpy as np
 import pandas as pd
-from IPython.display import display_png
-from SPARQLWrapper import SPARQLWrapper, JSON
-from pyparsing import ParseResults, ParseException
 from rdflib import Graph, URIRef, Literal, BNode, RDF
 from rdflib.namespace import NamespaceManager
-from rdflib.plugins.serializers.turtle import TurtleSerializer
-from rdflib.plugins.sparql.processor import SPARQLResult
-from rdflib.plugins.sparql.parser import parseQuery,parseUpdate
+from rdflib.query import Result
 
 from rdflib.store import Store
 from rdflib.term import Identifier, _castPythonToLiteral, Variable
 
+#
+# IPython,  SPARQLWrapper,  asyncio and the rdflib SPARQL engine (whose grammar takes a while to build) are imported
+# where they are used,  so a program only waits for the ones it needs when it does "import gastrodon"
+#
+
+if TYPE_CHECKING:
+    from pyparsing import ParseResults
+    from rdflib.plugins.sparql.parserutils import CompValue
+    from rdflib.plugins.sparql.processor import SPARQLResult
+    from rdflib.plugins.sparql.sparql import Query
+
 __version__ = '1.0.0'
 
 #
@@ -47,10 +75,28 @@ _var_regex=re.compile('[?$]([%s0-9][%s0-9\u00B7\u0300-\u036F\u203F-\u2040]*)' %
 # characters removed,  as this is used to tell if we can tell if a full URI can be safely converted to a QName
 # or not
 _valid_tail_regex=re.compile("[%s0-9]([%s.]*[%s])?" % (_pncu_regex,_pnc_regex,_pnc_regex))
+_json_whitespace=re.compile("[ \t\n\r]*")
+_json_decoder=json.JSONDecoder()
 
 # % (
 #     PN_CHARS_U_re)
 
+#
+# XSD datatypes for which a whole result column can be parsed in one numpy pass;  the lexical forms accepted by numpy
+# for these types are the same ones accepted by the int() and float() converters rdflib uses
+#
+
+_xsd="http://www.w3.org/2001/XMLSchema#"
+_xsd_numeric_types={
+    **{_xsd+x:np.int64 for x in (
+        "integer","int","long","short","byte",
+        "nonNegativeInteger","nonPositiveInteger","negativeInteger","positiveInteger",
+        "unsignedLong","unsignedInt","unsignedShort","unsignedByte"
+    )},
+    _xsd+"double":np.float64,
+    _xsd+"float":np.float64
+}
+
 class GastrodonURI(str):
     """
         This class is used to wrap a URI that is passed from Gastrodon to Pandas and back again.
@@ -68,6 +114,9 @@ class GastrodonURI(str):
     def __init__(self,short,uri_ref):
         self.uri_ref=uri_ref
 
+    def __getnewargs__(self):
+        return (str(self),self.uri_ref)
+
     def to_uri_ref(self) -> URIRef:
         """
         :return: an RDFLib :class:`rdflib.URIRef`
@@ -158,6 +207,506 @@ class GastrodonException(Exception):
         """
         raise GastrodonException(*args,**kwargs) from None
 
+class ResultCache:
+    """
+        In-memory cache of query results,  which can be shared by several endpoints.  Results are keyed on the
+        text of the query after argument substitution together with the identity of the endpoint,  so the same query
+        asked again of the same endpoint is answered without going to the endpoint.
+
+        The least recently used results are dropped once there are more than `max_entries` of them,  and results
+        older than `ttl` seconds are never returned.  An update made through an endpoint drops all of the results
+        cached for the graph it updates,  but changes made any other way (such as adding facts to the rdflib `Graph`
+        behind a :class:`LocalEndpoint`) are not noticed until the entries expire.
+
+        Each DataFrame handed out is a copy,  so callers can modify it freely.
+
+        :param max_entries: maximum number of results to keep
+        :param ttl: number of seconds a result stays valid,  None to keep results until they are evicted
+    """
+    def __init__(self,max_entries=128,ttl=None):
+        self.max_entries=max_entries
+        self.ttl=ttl
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+
+    def __getstate__(self):
+        # a cache sent to another process starts out empty there
+        state=self.__dict__.copy()
+        state.update(hits=0,misses=0,evictions=0,_entries=OrderedDict())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self._lock=threading.Lock()
+
+    def get(self,key):
+        """
+        :param key: cache key
+        :return: the cached value,  or None if it is not present
+        """
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic()-entry[0]>self.ttl:
+                del self._entries[key]
+                entry=None
+            if entry is None:
+                self.misses+=1
+                return None
+            self.hits+=1
+            self._entries.move_to_end(key)
+        return _share(entry[1])
+
+    def put(self,key,value):
+        """
+        :param key: cache key
+        :param value: value to cache
+        :return: nothing
+        """
+        with self._lock:
+            self._entries[key]=(time.monotonic(),value)
+            self._entries.move_to_end(key)
+            while len(self._entries)>self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions+=1
+
+    def invalidate(self,store):
+        """
+        Drop every result that came from a particular graph.
+
+        :param store: the identity of the graph,  which is the first element of the cache keys made for it
+        :return: nothing
+        """
+        with self._lock:
+            for key in [x for x in self._entries if x[0]==store]:
+                del self._entries[key]
+
+    def clear(self):
+        """
+        Drop all cached results
+
+        :return: nothing
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: dict with the number of hits,  misses,  evictions and entries currently cached
+        """
+        with self._lock:
+            return dict(hits=self.hits,misses=self.misses,evictions=self.evictions,entries=len(self._entries))
+
+class DiskCache:
+    """
+        Cache of query results kept in files,  so that they outlive the Python process.  A :class:`RemoteEndpoint`
+        made with a `disk_cache` keeps the results of `select` as Parquet files and those of `construct` as
+        N-Triples,  in a directory for each endpoint URL and default graph,  under a name made by hashing the text of
+        the query after argument substitution.  Parquet files hold the lexical form and type of each value rather
+        than converted values,  so a cached result is converted with the prefixes of the endpoint that reads it.
+        Cached results are read through memory maps;  writing and reading Parquet needs pyarrow.
+
+        Several processes,  such as the kernels of different notebooks,  can share one directory.  Results are
+        written to a temporary file which is then renamed into place,  so a half-written result is never read,  and a
+        result deleted by another process is just a miss.
+
+        Results older than `ttl` seconds are not used.  Once the files add up to more than `max_bytes`,  the least
+        recently used ones are deleted until they add up to `evict_to` times `max_bytes`.  Rather than look at every
+        file each time it writes one,  a DiskCache adds what it writes to the total it found when it last looked,
+        and only looks again once that passes `max_bytes` or `ttl` seconds have gone by;  since each process keeps
+        its own total,  several processes writing to one directory can take it a little over `max_bytes` for a
+        while.  An update made through an endpoint deletes the results cached for its URL and default graph,  but
+        changes made any other way are not noticed until the entries expire.
+
+        :param directory: directory to keep results in,  created if it does not exist
+        :param ttl: number of seconds a result stays valid,  None to keep results until they are evicted
+        :param max_bytes: total size of the files to keep,  None for no limit
+    """
+    evict_to=0.9
+
+    def __init__(self,directory,ttl=None,max_bytes=1<<30):
+        self.directory=os.path.abspath(os.fspath(directory))
+        self.ttl=ttl
+        self.max_bytes=max_bytes
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self._lock=threading.Lock()
+        # size of the directory when it was last looked at,  plus what has been written since
+        self._bytes=None
+        self._looked=0.0
+        os.makedirs(self.directory,exist_ok=True)
+
+    def get(self,store,key,suffix:str,read):
+        """
+        :param store: identity of the graph the result came from
+        :param key: cache key of the result within that graph
+        :param suffix: file name extension,  such as ".parquet"
+        :param read: function that reads the result given the path of its file
+        :return: what `read` returns,  or None if no current result is cached
+        """
+        path=self._path(store,key,suffix)
+        try:
+            modified=os.stat(path).st_mtime
+            now=time.time()
+            if self.ttl is not None and now-modified>self.ttl:
+                value=None
+            else:
+                # the access time orders eviction;  it is set here because filesystems often do not keep it
+                os.utime(path,(now,modified))
+                value=read(path)
+        except FileNotFoundError:
+            value=None
+        except ImportError:
+            raise
+        except Exception:
+            # a damaged file,  whatever error reading it raises,  is a miss;  it is deleted so it is written again
+            _discard(path)
+            value=None
+        with self._lock:
+            if value is None:
+                self.misses+=1
+            else:
+                self.hits+=1
+        return value
+
+    def put(self,store,key,suffix:str,write):
+        """
+        :param store: identity of the graph the result came from
+        :param key: cache key of the result within that graph
+        :param suffix: file name extension,  such as ".parquet"
+        :param write: function that writes the result to the binary file it is given
+        :return: true if the result was stored,  false if the filesystem refused it
+        """
+        path=self._path(store,key,suffix)
+        try:
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            (handle,temporary)=tempfile.mkstemp(suffix=".tmp",dir=os.path.dirname(path))
+        except OSError:
+            return False
+        try:
+            with os.fdopen(handle,"wb") as file:
+                write(file)
+                size=file.tell()
+            os.replace(temporary,path)
+        except OSError:
+            # a full disk,  or (on Windows) another process reading the file we are replacing
+            _discard(temporary)
+            return False
+        except BaseException:
+            _discard(temporary)
+            raise
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes+=size
+            due=self._bytes is None or (self.max_bytes is not None and self._bytes>self.max_bytes) \
+                or (self.ttl is not None and time.time()-self._looked>self.ttl)
+        if due:
+            self._evict()
+        return True
+
+    def invalidate(self,store):
+        """
+        Delete every result that came from a particular graph.
+
+        :param store: the identity of the graph
+        :return: nothing
+        """
+        self._remove(os.path.join(self.directory,_digest(store)))
+        with self._lock:
+            self._bytes=None
+
+    def clear(self):
+        """
+        Delete all cached results
+
+        :return: nothing
+        """
+        self._remove(self.directory)
+        with self._lock:
+            self._bytes=None
+
+    def stats(self):
+        """
+        Hits,  misses and evictions are counted by this process;  entries and bytes are what the directory holds.
+
+        :return: dict with the number of hits,  misses,  evictions,  entries and bytes currently cached
+        """
+        entries=list(self._entries())
+        with self._lock:
+            return dict(hits=self.hits,misses=self.misses,evictions=self.evictions,entries=len(entries),
+                        bytes=sum(x[1] for x in entries))
+
+    def _path(self,store,key,suffix:str) -> str:
+        return os.path.join(self.directory,_digest(store),_digest(key)+suffix)
+
+    def _entries(self):
+        '''
+        :return: iterator of (path, size, access time, modification time) for each cached result
+        '''
+        for (folder,_,names) in os.walk(self.directory):
+            for name in names:
+                path=os.path.join(folder,name)
+                try:
+                    info=os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    # left behind by a process that died while writing
+                    if time.time()-info.st_mtime>3600:
+                        _discard(path)
+                    continue
+                yield (path,info.st_size,info.st_atime,info.st_mtime)
+
+    def _evict(self):
+        if self.ttl is None and self.max_bytes is None:
+            return
+        now=time.time()
+        entries=[]
+        evicted=0
+        for entry in self._entries():
+            if self.ttl is not None and now-entry[3]>self.ttl:
+                evicted+=_discard(entry[0])
+            else:
+                entries.append(entry)
+        total=sum(x[1] for x in entries)
+        if self.max_bytes is not None and total>self.max_bytes:
+            for (path,size,_,_) in sorted(entries,key=lambda x:x[2]):
+                if total<=self.max_bytes*self.evict_to:
+                    break
+                evicted+=_discard(path)
+                total-=size
+        with self._lock:
+            self.evictions+=evicted
+            (self._bytes,self._looked)=(total,now)
+
+    def _remove(self,directory:str):
+        for (folder,_,names) in os.walk(directory):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    _discard(os.path.join(folder,name))
+
+class QueryTiming:
+    """
+        How long one query took,  broken down by phase.  Endpoints hand one of these to each of their listeners
+        (see :meth:`Endpoint.add_listener`) after every query.
+
+        The phases are
+
+        - ``parse``:  parsing the query and prepending namespace declarations
+        - ``substitute``:  finding variables in the caller's frame and writing them into the query
+        - ``execute``:  running the query,  including the round trip to a remote endpoint
+        - ``decode``:  parsing the response into rows
+        - ``frame``:  converting columns to Python values and building the DataFrame or Arrow table
+
+        The phases do not overlap,  and time spent between them is not counted,  so the phases add up to a little
+        less than `total`.  Queries answered from a :class:`ResultCache` or a :class:`DiskCache` have `cached` set.
+
+        :ivar operation: name of the operation,  such as "select_frame" or "update"
+        :ivar sparql: text of the query after substitution,  None if it failed before that
+        :ivar phases: dict mapping the name of each phase to seconds
+        :ivar total: seconds from the start to the end of the query
+        :ivar rows: number of rows (or triples) in the result,  None if not known
+        :ivar bytes: size of the response from a remote endpoint,  None if not known
+        :ivar cached: true if the result came from the cache
+        :ivar error: the exception the query raised,  None if it succeeded
+    """
+    phase_names=("parse","substitute","execute","decode","frame")
+
+    def __init__(self,operation:str):
+        self.operation=operation
+        self.sparql=None
+        self.phases=dict.fromkeys(self.phase_names,0.0)
+        self.total=None
+        self.rows=None
+        self.bytes=None
+        self.cached=False
+        self.error=None
+        self._start=time.perf_counter()
+        self._mark=self._start
+        self._open=[]
+
+    def _enter(self,phase:str):
+        now=time.perf_counter()
+        if self._open:
+            self.phases[self._open[-1]]+=now-self._mark
+        self._open.append(phase)
+        self._mark=now
+
+    def _exit(self):
+        now=time.perf_counter()
+        self.phases[self._open.pop()]+=now-self._mark
+        self._mark=now
+
+    def _finish(self,error):
+        self.total=time.perf_counter()-self._start
+        self.error=error
+
+    def __repr__(self):
+        phases=", ".join("%s=%.4f" % x for x in self.phases.items() if x[1])
+        return "<QueryTiming %s %.4fs (%s) rows=%s>" % (self.operation,self.total or 0.0,phases,self.rows)
+
+class QueryStats:
+    """
+        Rolling statistics on the queries made through an endpoint,  kept over the last `window` queries.  Create
+        one with :meth:`Endpoint.enable_stats`,  or add one to any endpoint with :meth:`Endpoint.add_listener`.
+
+        :param window: number of recent queries the latency percentiles and averages are taken over
+    """
+    def __init__(self,window=1000):
+        self.window=window
+        self.queries=0
+        self.errors=0
+        self.cached=0
+        self.rows=0
+        self.bytes=0
+        self._recent=deque(maxlen=window)
+        self._lock=threading.Lock()
+
+    def __call__(self,timing:QueryTiming):
+        with self._lock:
+            self.queries+=1
+            self.errors+=timing.error is not None
+            self.cached+=timing.cached
+            self.rows+=timing.rows or 0
+            self.bytes+=timing.bytes or 0
+            self._recent.append(timing)
+
+    def summary(self):
+        """
+        :return: dict with the number of queries,  errors and cache hits,  total rows and bytes,  and for the
+            recent queries the 50th and 99th percentile latency,  mean rows and bytes per query and mean seconds
+            spent in each phase
+        """
+        with self._lock:
+            recent=list(self._recent)
+            output=dict(queries=self.queries,errors=self.errors,cached=self.cached,rows=self.rows,bytes=self.bytes)
+        if not recent:
+            return output
+
+        latency=np.array([x.total for x in recent])
+        output["p50"]=float(np.percentile(latency,50))
+        output["p99"]=float(np.percentile(latency,99))
+        output["mean_rows"]=float(np.mean([x.rows or 0 for x in recent]))
+        output["mean_bytes"]=float(np.mean([x.bytes or 0 for x in recent]))
+        for phase in QueryTiming.phase_names:
+            output[phase]=float(np.mean([x.phases[phase] for x in recent]))
+        return output
+
+    def reset(self):
+        """
+        Forget all queries seen so far
+
+        :return: nothing
+        """
+        with self._lock:
+            self.queries=self.errors=self.cached=self.rows=self.bytes=0
+            self._recent.clear()
+
+class QueryTrace:
+    """
+        Records the :class:`QueryTiming` of every query made through an endpoint while it is started.  Use it as a
+        context manager around a block of code,  or call `start` in one Jupyter cell and `stop` in a later one to
+        trace everything in between::
+
+            trace=endpoint.trace()
+            ...
+            trace.stop()
+            trace.frame()
+
+        :param endpoint: the endpoint whose queries are traced
+    """
+    def __init__(self,endpoint:"Endpoint"):
+        self.endpoint=endpoint
+        self.timings=[]
+        self._started=False
+
+    def start(self):
+        """
+        Start recording queries
+
+        :return: this trace
+        """
+        if not self._started:
+            self.endpoint.add_listener(self.timings.append)
+            self._started=True
+        return self
+
+    def stop(self):
+        """
+        Stop recording queries
+
+        :return: this trace
+        """
+        self.endpoint.remove_listener(self.timings.append)
+        self._started=False
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,kind,value,traceback):
+        self.stop()
+        return False
+
+    def frame(self) -> pd.DataFrame:
+        """
+        :return: Pandas DataFrame with one row for each query recorded,  giving its operation,  total time,  time
+            in each phase,  rows,  bytes,  whether it was cached,  the error if any,  and its text
+        """
+        return pd.DataFrame([
+            dict(operation=x.operation,total=x.total,**x.phases,rows=x.rows,bytes=x.bytes,cached=x.cached,
+                 error=x.error,sparql=x.sparql)
+            for x in self.timings
+        ],columns=["operation","total",*QueryTiming.phase_names,"rows","bytes","cached","error","sparql"])
+
+class QueryProfile:
+    """
+        The rdflib query plan of a query,  annotated with counts and times by :meth:`LocalEndpoint.profile` or
+        left bare by :meth:`LocalEndpoint.explain`.  It is displayed as an indented tree,  and `frame` returns it as
+        a DataFrame.
+
+        For each operator,  `calls` is the number of times it was evaluated (the inner side of a join is evaluated
+        once for each solution of the outer side),  `rows` the number of solutions it produced over all of those
+        calls,  `time` the seconds spent in it and the operators below it,  and `self_time` the seconds spent in it
+        alone.
+
+        :ivar plan: list of dicts,  one for each operator,  in depth-first order
+        :ivar total: seconds the whole query took,  None for a plan that was not run
+        :ivar result: the result of the query,  None for a plan that was not run
+    """
+    def __init__(self,plan,total,result=None):
+        self.plan=plan
+        self.total=total
+        self.result=result
+
+    def frame(self) -> pd.DataFrame:
+        """
+        :return: Pandas DataFrame with one row for each operator,  whose names are indented to show the tree
+        """
+        frame=pd.DataFrame(self.plan)
+        frame["operator"]=["  "*x["depth"]+x["operator"] for x in self.plan]
+        return frame.drop(columns=["depth"])
+
+    def __repr__(self):
+        lines=[]
+        for x in self.plan:
+            line="  "*x["depth"]+x["operator"]
+            if x["detail"]:
+                line+=" "+x["detail"]
+            if "calls" in x:
+                line+="  [calls=%d rows=%d time=%.4fs self=%.4fs]" % (x["calls"],x["rows"],x["time"],x["self_time"])
+            lines.append(line)
+        if self.total is not None:
+            lines.append("total %.4fs" % self.total)
+        return "\n".join(lines)
+
+    def _repr_html_(self):
+        return self.frame()._repr_html_()
+
 class Endpoint(metaclass=ABCMeta):
     """
         An Endpoint is something which can answer SPARQL queries.    `Endpoint`
@@ -167,14 +716,48 @@ class Endpoint(metaclass=ABCMeta):
 
         :param prefixes: Graph object with attached namespace mappings to be applied to the new :class:`Endpoint`
         :param base_uri: base URI to control the base namespace of the :class:`Endpoint` as we see it.
+        :param cache: :class:`ResultCache` used to remember the results of SELECT queries,  None to not cache
     """
     qname_regex=re.compile("(?<![A-Za-z<])([A-Za-z_][A-Za-z_0-9.-]*):")
-
-    def __init__(self,prefixes:Graph=None,base_uri=None):
+    uri_cache_size=65536
+    compact_rows=100000
+    decollect_batch_size=500
+    values_batch_size=1000
+    select_workers=4
+    retry_delay=0.5
+    # errors after which an update is worth sending again
+    _transient_errors=(URLError,ConnectionError,socket.timeout)
+
+    def __init__(self,prefixes:Graph=None,base_uri=None,cache:ResultCache=None):
         self.prefixes=prefixes
         self.base_uri=base_uri
+        self.cache=cache
+        self.stats=None
+        self._serial=next(_serials)
+        self._listeners=()
+        self._namespace_of={}
+        self._prefix_of={}
         if prefixes!=None:
-            self._namespaces=set(map(lambda y: y if y[-1] in {"#", "/"} else y + "/", [str(x[1]) for x in prefixes.namespaces()]))
+            for (prefix,namespace) in prefixes.namespaces():
+                self._namespace_of.setdefault(prefix,namespace)
+                self._prefix_of.setdefault(str(namespace),prefix)
+            self._namespaces=set(map(lambda y: y if y[-1] in {"#", "/"} else y + "/", self._prefix_of))
+
+        # URIs repeat heavily in query results,  so each distinct URI is shortened only once
+        self._uri_to_python=lru_cache(maxsize=self.uri_cache_size)(self._convert_uri)
+
+    def __getstate__(self):
+        # a copy sent to a worker process keeps the configuration,  but not the listeners or memoized conversions
+        state=self.__dict__.copy()
+        state["_listeners"]=()
+        state["stats"]=None
+        del state["_uri_to_python"]
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self._serial=next(_serials)
+        self._uri_to_python=lru_cache(maxsize=self.uri_cache_size)(self._convert_uri)
 
     def namespaces(self):
         """
@@ -280,18 +863,24 @@ class Endpoint(metaclass=ABCMeta):
             return None
 
         if isinstance(term, URIRef):
-            if self.prefixes !=None and ("/" in term.toPython() or str(term).startswith('urn:')):
-                if self.base_uri and str(term).startswith(self.base_uri):
-                    return GastrodonURI("<" + term[len(self.base_uri):] + ">", term)
-                if self.is_ok_qname(term):
-                    try:
-                        return GastrodonURI(self.short_name(term), term)
-                    except Exception:
-                        pass
+            if self.prefixes !=None:
+                return self._uri_to_python(term)
             return term
 
         return term.toPython()
 
+    def _convert_uri(self, term:URIRef):
+        x = str(term)
+        if "/" in x or x.startswith('urn:'):
+            if self.base_uri and x.startswith(self.base_uri):
+                return GastrodonURI("<" + x[len(self.base_uri):] + ">", term)
+            if self.is_ok_qname(term):
+                try:
+                    return GastrodonURI(self.short_name(term), term)
+                except Exception:
+                    pass
+        return term
+
     def short_name(self,term):
         """
         Assuming we've made the following namespace declaration on this endpoint,
@@ -311,32 +900,32 @@ class Endpoint(metaclass=ABCMeta):
         :param term: URIRef which can be expressed with a QName
         :return: the QName,  as a string
         """
+        x = str(term)
+        pos = max(x.rfind('#'), x.rfind('/')) + 1
+        prefix = self._prefix_of.get(x[:pos])
+        if prefix is not None and _valid_tail_regex.fullmatch(x[pos:]):
+            return ":".join((prefix, x[pos:]))
+
         prefix, namespace, name = self.prefixes.compute_qname(term)
         return ":".join((prefix, name))
 
-    def _process_namespaces(self, sparql, parseFn):
+    def _process_namespaces(self, sparql, update=False):
         if self.prefixes != None:
-            sparql = self._prepend_namespaces(sparql, parseFn)
+            sparql = self._prepend_namespaces(_prepare(sparql,update))
         return sparql
 
     def _candidate_prefixes(self, sparql:str):
         return {x.group(1) for x in self.qname_regex.finditer(sparql)}
 
-    def _prepend_namespaces(self, sparql:str, parseFn):
+    def _prepend_namespaces(self, prepared:"_PreparedQuery"):
 
-        # extract prefixes and base uri from the query so that we won't try to
-        # overwrite them
+        # prefixes and base uri declared in the query are not overwritten
 
-        parsed = parseFn(sparql)
-        (query_base,query_ns)=_extract_decl(parsed,parseFn)
-
-        candidates=self._candidate_prefixes(sparql)
-        for (q_prefix,q_uri) in query_ns.namespaces():
-            if q_prefix in candidates:
-                candidates.remove(q_prefix)
+        sparql = prepared.sparql
+        candidates=self._candidate_prefixes(sparql)-prepared.declared
 
         ns_section = ""
-        if self.base_uri and not query_base:
+        if self.base_uri and not prepared.base:
             ns_section += "base <%s>\n" % (self.base_uri)
 
         for name,value in self.prefixes.namespaces():
@@ -346,19 +935,22 @@ class Endpoint(metaclass=ABCMeta):
         return ns_section+sparql
 
     def _substitute_arguments(self, sparql:str, args:Dict, prefixes:NamespaceManager) -> str:
-        def substitute_one(m:Match):
-            name=m.group(1)
-            if name not in args:
-                return m.group()
-            return self._to_rdf(args[name], prefixes).n3()
-
-        sparql = _var_regex.sub(substitute_one,sparql)
-        return sparql
+        template = _compile_template(sparql)
+        serialize = lambda value: template.n3(value, prefixes, self._to_rdf)
+        tables = sorted(name for name in template.names.intersection(args) if isinstance(args[name],_values_types))
+        if not tables:
+            return template.render(args, serialize)
+
+        # variables bound to many values stay in the query,  and VALUES blocks give them their values
+        blocks = [_values_block(name, args[name], serialize) for name in tables]
+        bound = {name for (names,text) in blocks for name in names}
+        sparql = template.render({k:v for (k,v) in args.items() if k not in bound}, serialize)
+        return _add_values(sparql, [text for (names,text) in blocks])
 
     def _to_rdf(self, value, prefixes):
         if not isinstance(value, Identifier):
             if isinstance(value, QName):
-                value = value.toURIRef(prefixes)
+                value = self._expand_qname(value, prefixes)
             elif isinstance(value, GastrodonURI):
                 value = value.to_uri_ref()
             else:
@@ -368,11 +960,18 @@ class Endpoint(metaclass=ABCMeta):
             value = self._bnode_to_sparql(value)
         return value
 
+    def _expand_qname(self, qname:QName, prefixes):
+        if prefixes is self.prefixes and ":" in qname.name:
+            head,tail=qname.name.split(':',1)
+            if head in self._namespace_of:
+                return self._namespace_of[head]+tail
+        return qname.toURIRef(prefixes)
+
     def _bnode_to_sparql(self, bnode):
         return bnode
 
     def _normalize_column_type(self,column):
-        if not all(filter(lambda x:x==None or type(x)==str,column)):
+        if not all(x==None or type(x)==str for x in column):
             return column
         try:
             return [None if x==None else int(x) for x in column]
@@ -387,90 +986,125 @@ class Endpoint(metaclass=ABCMeta):
         return column
 
     def _dataframe(self, result:SPARQLResult)->pd.DataFrame:
-        columnNames = [str(x) for x in result.vars]
-        column = OrderedDict()
-        for name in columnNames:
-            column[name] = []
-        for bindings in result.bindings:
-            for variable in result.vars:
-                column[str(variable)].append(self.to_python(bindings.get(variable)))
-
-        for key in column:
-            column[key] = self._normalize_column_type(column[key])
-
-        return pd.DataFrame(column)
+        return self._bindings_frame(result.vars, result.bindings)
+
+    def _bindings_frame(self, variables, rows)->pd.DataFrame:
+        return self._frame(_term_columns(variables, rows))
+
+    def _frame(self, columns)->pd.DataFrame:
+        with self._phase("frame"):
+            column = OrderedDict()
+            for (name,keys,values) in columns:
+                column[name] = self._convert_column(keys, values)
+            return pd.DataFrame(column)
+
+    def _convert_column(self, keys, values):
+        #
+        # convert one result column given the term key (kind, datatype, language) and the lexical form of each cell;
+        # if every bound cell shares a numeric datatype the whole column is parsed at once by numpy,  otherwise
+        # each distinct term is converted only once
+        #
+
+        present = set(keys)
+        present.discard(None)
+        if len(present)==1:
+            key = next(iter(present))
+            (kind,datatype,language) = key
+            if kind=="literal" and datatype in _xsd_numeric_types:
+                try:
+                    return _parse_numeric_column(values, _xsd_numeric_types[datatype])
+                except (ValueError, OverflowError):
+                    pass
+
+            # every bound cell is the same kind of term,  so pandas can find the distinct ones by lexical form alone
+            (codes,uniques) = pd.factorize(np.array(values,dtype=object))
+            converted = self._normalize_column_type([self.to_python(_make_term(key,x)) for x in uniques])
+            column = _spread(converted,codes)
+            return _object_column(column) if kind=="uri" else column
+
+        memo = {}
+        column = []
+        for key,value in zip(keys,values):
+            if key is None:
+                column.append(None)
+                continue
+            cell = (key,value)
+            if cell not in memo:
+                memo[cell] = self.to_python(_make_term(key,value))
+            column.append(memo[cell])
+
+        if any(isinstance(x,(GastrodonURI,Identifier)) for x in memo.values()):
+            return _object_column(column)
+        return self._normalize_column_type(column)
 
     def decollect(self,node):
         '''
+        Convert an RDF container to Python.  The type of the container and its members are fetched together in one
+        query.
 
         :param node: a URIRef pointing to an rdf:Seq, rdf:Bag, or rdf:Alt
-        :return: a Python List, Counter, or Set of POPOs
+        :return: a Python List or Counter of POPOs
         '''
-        survey=self.select_raw("""
-            SELECT ?type {
-                VALUES (?type) { (rdf:Seq) (rdf:Bag) (rdf:Alt)}
-                ?s a ?type
-            } 
-        """,bindings=dict(s=node))
-
-        types=self._set(survey)
-        if RDF.Bag in types:
-            return self._decollect_Bag(node)
-
-        return self._decollect_Seq(node)
-
-    def _decollect_Seq(self, node):
-        items=self.select_raw("""
-            SELECT ?index ?item {
-                ?s ?predicate ?item
-                FILTER(STRSTARTS(STR(?predicate),"http://www.w3.org/1999/02/22-rdf-syntax-ns#_"))
-                BIND(xsd:integer(SUBSTR(STR(?predicate),45)) AS ?index)
-            } ORDER BY ?index
-        """,bindings=dict(s=node))
-        output=[]
-        for x in items:
-            output.append(self.to_python(x["item"]))
-        return output
-
+        return self.decollect_many([node])[node]
 
-    def _decollect_Bag(self, node):
-        items=self.select_raw("""
-            SELECT ?item (COUNT(*) AS ?count) {
-                ?s ?predicate ?item
-                FILTER(STRSTARTS(STR(?predicate),"http://www.w3.org/1999/02/22-rdf-syntax-ns#_"))
-                BIND(xsd:integer(SUBSTR(STR(?predicate),45)) AS ?index)
-            } GROUP BY ?item 
-        """,bindings=dict(s=node))
-        output=Counter()
-
-        for x in items:
-            output[self.to_python(x["item"])]=self.to_python(x["count"])
+    def decollect_many(self,nodes,batch_size=None):
+        '''
+        Convert many RDF containers to Python.  The containers are fetched `batch_size` at a time,  with one query
+        for each batch,  rather than with queries for each container.  Blank nodes cannot be named in a query,  so
+        containers that are blank nodes still take a query each.
 
+        :param nodes: list of URIRefs pointing to rdf:Seq, rdf:Bag, or rdf:Alt containers
+        :param batch_size: number of containers fetched by each query,  defaults to `decollect_batch_size`
+        :return: dict mapping each node to a Python List or Counter of POPOs
+        '''
+        nodes=list(dict.fromkeys(nodes))
+        batch_size=batch_size or self.decollect_batch_size
+        output={}
+        for start in range(0,len(nodes),batch_size):
+            output.update(self._decollect_batch(nodes[start:start+batch_size]))
         return output
 
-
-    def _decollect_Seq(self, node):
-        items=self.select_raw("""
-            SELECT ?index ?item {
-                ?s ?predicate ?item
-                FILTER(STRSTARTS(STR(?predicate),"http://www.w3.org/1999/02/22-rdf-syntax-ns#_"))
-                BIND(xsd:integer(SUBSTR(STR(?predicate),45)) AS ?index)
-            } ORDER BY ?index
-        """,bindings=dict(s=node))
-        output=[]
-        for x in items:
-            output.append(self.to_python(x["item"]))
+    def _decollect_batch(self, nodes):
+        terms=[self._to_rdf(x,self.prefixes) for x in nodes]
+        # a blank node cannot be written into a VALUES block,  so containers that are blank nodes are fetched one by one
+        single=[x for (term,x) in zip(terms,nodes) if isinstance(term,BNode)]
+        named=[(term,x) for (term,x) in zip(terms,nodes) if not isinstance(term,BNode)]
+        if len(named)==1:
+            single.append(named.pop()[1])
+
+        rows=[]
+        for node in single:
+            rows+=self._decollect_rows(node)
+        if named:
+            S=Variable("s")
+            node_named={str(term):x for (term,x) in named}
+            values="VALUES ?s { %s }" % " ".join(term.n3() for (term,x) in named)
+            result=self._run_operation(_decollect_query % ("?s ?predicate ?item",values),self._select,_cached=True)
+            rows+=[(node_named[str(x[S])],x[_predicate],x[_item]) for x in result.bindings]
+
+        bags=set()
+        members={x:[] for x in nodes}
+        for (node,predicate,item) in rows:
+            if predicate==RDF.type:
+                if item==RDF.Bag:
+                    bags.add(node)
+                continue
+            index=str(predicate)[len(_member_prefix):]
+            if index.isdigit():
+                members[node].append((int(index),item))
+
+        output={}
+        for (node,items) in members.items():
+            if node in bags:
+                output[node]=Counter(self.to_python(item) for (index,item) in items)
+            else:
+                output[node]=[self.to_python(item) for (index,item) in sorted(items,key=lambda x:x[0])]
         return output
 
-    def _set(self,result):
-        columnNames=result.vars
-        if len(columnNames)>1:
-            raise ValueError("Currently can only create a set from a single column result")
-        that=columnNames[0]
-        output=set()
-        for bindings in result.bindings:
-            output.add(bindings[that])
-        return output
+    def _decollect_rows(self, node):
+        # the query for a single container does not change,  so it is only parsed once
+        result=self.select_raw(_decollect_query % ("?predicate ?item",""),bindings=dict(s=node))
+        return [(node,x[_predicate],x[_item]) for x in result.bindings]
 
     @abstractmethod
     def _select(self, sparql,**kwargs) -> SPARQLResult:
@@ -484,7 +1118,7 @@ class Endpoint(metaclass=ABCMeta):
     def _update(self, sparql,**kwargs) -> None:
         pass
 
-    def select(self,sparql:str,**kwargs) -> pd.DataFrame:
+    def select(self,sparql:str,compact=None,batch_size=None,workers=None,**kwargs) -> pd.DataFrame:
         """
         Perform a SPARQL SELECT query against the endpoint.  To make interactive
         queries easy in the Jupyter environment,  any variable with a name beginning with
@@ -496,20 +1130,235 @@ class Endpoint(metaclass=ABCMeta):
         from the cells in the notebook.  If you call it inside a function definition,  it
         sees variables local to that definition.
 
+        Large results can be returned in a compact form:  URI columns become Pandas Categoricals whose categories
+        are the :class:`GastrodonURI` values,  so each distinct URI is stored once and values taken from the column
+        still substitute into queries as URIs,  and columns of strings use the ``string[pyarrow]`` type if pyarrow
+        is installed.
+
+        A variable bound to a list,  set,  tuple,  numpy array,  Pandas Index or Series is not written into the query
+        as one value;  instead a VALUES block at the start of the WHERE clause gives it each of the values in turn,
+        so that one query can look up thousands of URIs taken from an earlier result.  A DataFrame binds several
+        variables at once:  its column with the name of the variable it is bound to gives that variable its values,
+        and each other column (say ``date``) binds the matching variable (``?_date``) in the same row.  Missing
+        values are written as UNDEF.
+
+        When a variable has more than `batch_size` values the query is split into several,  each with a share of the
+        values,  which are run `workers` at a time and concatenated.  That gives the same result as one query unless
+        the query aggregates,  orders or limits rows across different values.
+
         :param sparql: SPARQL SELECT query
+        :param compact: true to return the compact form,  false not to,  None to return it for results of at least
+            `compact_rows` rows
+        :param batch_size: most values in the VALUES block of one query,  None for `values_batch_size`
+        :param workers: number of queries to run at once when the values are split,  None for `select_workers`
         :param kwargs: any keyword arguments are implementation-dependent
         :return: SELECT result as a Pandas DataFrame
         """
-        result = self.select_raw(sparql,_user_frame=3,**kwargs)
-        frame=self._dataframe(result)
-        columnNames = {str(x) for x in result.vars}
-        parsed=_parseQuery(sparql)
-        group_variables=_extract_group_by(parsed)
+        batch_size = batch_size or self.values_batch_size
+        workers = workers or self.select_workers
+        frame = self._exec_raw(sparql,self._select_frame,2,_batch_size=batch_size,_workers=workers,_cached=True,
+                               **kwargs)
+        if compact or (compact is None and len(frame)>=self.compact_rows):
+            frame = _compact_frame(frame)
+        return self._index_frame(frame,_prepare(sparql).group_by)
+
+    def select_iter(self,sparql:str,chunk_rows=10000,_user_frame=2,**kwargs):
+        """
+        Perform a SPARQL SELECT query with the same substitutions as the select method,  but return the
+        result as a sequence of DataFrames with at most `chunk_rows` rows each.  A :class:`RemoteEndpoint` reads
+        the result from the network as the chunks are consumed,  so the whole result never has to be held in memory.
+
+        Concatenating the chunks gives the same DataFrame that `select` would return.
+
+        :param sparql: SPARQL SELECT query
+        :param chunk_rows: maximum number of rows in each DataFrame
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: iterator of Pandas DataFrames
+        """
+        frames = self._exec_raw(sparql,self._select_iter,_user_frame,chunk_rows=chunk_rows,**kwargs)
+        group_variables = _prepare(sparql).group_by
+        return _ClosingIterator((self._index_frame(frame,group_variables) for frame in frames),frames)
+
+    def select_paged(self,sparql:str,key:str,page_size=10000,prefetch=True,concat=True,_user_frame=1,**kwargs):
+        """
+        Perform a SPARQL SELECT query one page at a time,  for results too big for an endpoint to return at once.
+
+        Rather than step through the result with OFFSET,  which makes the endpoint compute and skip every earlier
+        row for each page,  each page is ordered by the `key` variable and starts after the last key seen,  so the
+        query is run as ``ORDER BY ?key LIMIT page_size`` with ``FILTER(?key > last)`` added to its WHERE clause.
+        The key must be bound in every row and no two rows may share a key value,  otherwise rows are lost between
+        pages.  IRIs and strings are compared by their text,  since a string converted to Python has lost any
+        language tag;  keys that are strings should all be in one language,  the order ORDER BY puts different
+        languages in being up to the endpoint.  If a page ends on a key that is not past the end of the one before,
+        a ValueError is raised rather than fetching the same page again.
+
+        The query must not have ORDER BY,  LIMIT,  OFFSET or a VALUES block at the end.  If it has GROUP BY,  the key
+        must be one of the grouping variables.
+
+        :param sparql: SPARQL SELECT query
+        :param key: name of the variable to page by,  with or without the leading ?
+        :param page_size: number of rows to fetch in each page
+        :param prefetch: if true fetch the next page while the last one is being used
+        :param concat: if true return one DataFrame,  otherwise an iterator of one DataFrame per page
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: Pandas DataFrame or iterator of Pandas DataFrames
+        """
+        key = key.lstrip("?$")
+        template = self._prepare_query(sparql)
+        _check_pageable(_prepare(template),key)
+        if "bindings" in kwargs:
+            bindings = kwargs.pop("bindings")
+        else:
+            bindings = self._filter_frame(_getframe(_user_frame),_compile_template(template).names)
+
+        query = self._substitute_arguments(template, bindings, self.prefixes)
+        pages = self._pages(query, key, page_size, prefetch, _prepare(sparql).group_by, **kwargs)
+        if not concat:
+            return pages
+
+        frames = list(pages)
+        # empty frames have object columns that would spoil the types of the others
+        return pd.concat([x for x in frames if len(x)] or frames[:1])
+
+    def _pages(self, sparql:str, key:str, page_size, prefetch, group_variables, **kwargs):
+        fetch = lambda after: self._run_select_frame(_page_query(sparql,key,after,page_size),**kwargs)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = fetch(None)
+            after = None
+            while True:
+                upcoming = None
+                if len(page)>=page_size:
+                    (last,after) = (after,self._page_filter(key,page[key].iloc[-1]))
+                    if after==last:
+                        raise ValueError("Paging by ?%s does not get past the key value %r" % (key,page[key].iloc[-1]))
+                    upcoming = executor.submit(fetch,after) if prefetch else partial(fetch,after)
+                yield self._index_frame(page,group_variables)
+                if upcoming is None:
+                    return
+                page = upcoming.result() if prefetch else upcoming()
+
+    def _page_filter(self, key:str, value) -> str:
+        if value is None or (isinstance(value,float) and math.isnan(value)):
+            raise ValueError("Cannot page by ?%s because it is not bound in every row" % key)
+
+        if isinstance(value,np.generic):
+            value = value.item()
+        term = self._to_rdf(value, self.prefixes)
+        # the value of a language-tagged literal comes back as a str,  which does not compare with the literal
+        if isinstance(term,URIRef) or isinstance(value,str):
+            return "STR(?%s) > %s" % (key,Literal(str(term)).n3())
+        return "?%s > %s" % (key,term.n3())
+
+    def select_arrow(self,sparql:str,pandas=False,_user_frame=2,**kwargs):
+        """
+        Perform a SPARQL SELECT query,  making the same substitutions as the select method,  and return the result
+        as a :class:`pyarrow.Table` built straight from the lexical forms in the result,  for Arrow and Parquet
+        pipelines.  This requires pyarrow.
+
+        Integer,  floating point,  decimal,  boolean,  date and dateTime columns become native Arrow types.  URIs,
+        blank nodes and language-tagged literals are dictionary-encoded strings;  URIs are written in full,  not
+        shortened,  so they mean the same thing outside Gastrodon.  Any other column,  including one that mixes
+        kinds of term,  holds the lexical forms as strings.
+
+        :param sparql: SPARQL SELECT query
+        :param pandas: if true return the table as a Pandas DataFrame of Arrow-backed columns,  which shares the
+            Arrow memory instead of copying it
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: pyarrow Table or Pandas DataFrame
+        """
+        table = self._exec_raw(sparql,self._select_arrow,_user_frame,**kwargs)
+        return table.to_pandas(types_mapper=pd.ArrowDtype) if pandas else table
+
+    def select_many(self,sparql:str,bindings_list,workers=None,concat=True,key="item",**kwargs):
+        """
+        Run one SPARQL SELECT query once for each of a list of binding sets,  for instance to look up the same
+        facts about many different resources.  The namespace declarations for the query are worked out once and
+        the queries are run `workers` at a time.
+
+        The results can be returned as one DataFrame,  where the column named by `key` holds the position of the
+        binding set in `bindings_list` that produced each row,  or as a list of DataFrames in the same order as
+        `bindings_list`.
+
+        A query that fails does not stop the others.  In a list of DataFrames the exception takes the place of the
+        DataFrame;  a concatenated DataFrame leaves those rows out and lists the exceptions by position in
+        ``frame.attrs["errors"]``.
+
+        :param sparql: SPARQL SELECT query
+        :param bindings_list: list of dicts of values to substitute for SPARQL variables,  as for `bindings`
+        :param workers: number of queries to run at once,  None for `select_workers`
+        :param concat: if true return one DataFrame,  otherwise a list of DataFrames
+        :param key: name of the column that identifies the binding set in a concatenated DataFrame
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: Pandas DataFrame or list of Pandas DataFrames and exceptions
+        """
+        workers=workers or self.select_workers
+        prepared=self._prepare_query(sparql)
+        group_variables=_prepare(sparql).group_by
+        queries=[
+            self._outcome(partial(self._substitute_arguments,prepared,bindings,self.prefixes))
+            for bindings in bindings_list
+        ]
+
+        if workers>1 and len(queries)>1:
+            with self._select_many_executor(workers) as (executor,task):
+                futures=[None if isinstance(x,Exception) else executor.submit(task,x,**kwargs) for x in queries]
+                outcomes=[x if future is None else self._outcome(future.result) for (x,future) in zip(queries,futures)]
+        else:
+            outcomes=[
+                x if isinstance(x,Exception) else self._outcome(partial(self._run_select_frame,x,**kwargs))
+                for x in queries
+            ]
+
+        frames=[x if isinstance(x,Exception) else self._index_frame(x,group_variables) for x in outcomes]
+        if not concat:
+            return frames
+
+        errors={index:x for (index,x) in enumerate(frames) if isinstance(x,Exception)}
+        keyed=[frame.assign(**{key:index}) for (index,frame) in enumerate(frames) if index not in errors]
+        # empty frames have object columns that would spoil the types of the others
+        keyed=[x for x in keyed if len(x)] or keyed[:1]
+        # the row numbers of each frame would repeat,  but an index made by GROUP BY is kept
+        numbered=all(isinstance(x.index,pd.RangeIndex) for x in keyed)
+        frame=pd.concat(keyed,ignore_index=numbered) if keyed else pd.DataFrame(columns=[key])
+        frame.attrs["errors"]=errors
+        return frame
+
+    @contextmanager
+    def _select_many_executor(self, workers):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield (executor,self._run_select_frame)
 
-        if group_variables and all([x in columnNames for x in group_variables]):
+    def _run_select_frame(self, sparql:str, **kwargs) -> pd.DataFrame:
+        return self._run_operation(sparql, self._select_frame, _cached=True, **kwargs)
+
+    def _select_frame(self, sparql:str, **kwargs) -> pd.DataFrame:
+        return self._dataframe(self._select(sparql, **kwargs))
+
+    def _outcome(self, fn):
+        try:
+            return fn()
+        except Exception as x:
+            return x
+
+    def _index_frame(self, frame:pd.DataFrame, group_variables):
+        if group_variables and all([x in frame.columns for x in group_variables]):
             frame.set_index(group_variables,inplace=True)
         return frame
 
+    def _select_arrow(self, sparql:str, **kwargs):
+        result = self._select(sparql, **kwargs)
+        with self._phase("frame"):
+            return _arrow_table(_term_columns(result.vars, result.bindings))
+
+    def _select_iter(self, sparql:str, chunk_rows, **kwargs):
+        result = self._select(sparql, **kwargs)
+        return self._chunk_frames(result.vars, result.bindings, chunk_rows)
+
+    def _chunk_frames(self, variables, rows, chunk_rows):
+        yield self._bindings_frame(variables, rows[:chunk_rows])
+        for start in range(chunk_rows, len(rows), chunk_rows):
+            yield self._bindings_frame(variables, rows[start:start+chunk_rows])
+
     def select_raw(self,sparql:str,_user_frame=2,**kwargs) -> SPARQLResult:
         """
         Perform a SPARQL SELECT query as would the select method,  but do not
@@ -520,22 +1369,132 @@ class Endpoint(metaclass=ABCMeta):
         :param kwargs: any keyword arguments are implementation-dependent
         :return: result as a SPARQLResult
         """
-        return self._exec_raw(sparql,self._select,_user_frame,**kwargs)
+        return self._exec_raw(sparql,self._select,_user_frame,_cached=True,**kwargs)
 
-    def construct(self,sparql:str,_user_frame=2,**kwargs):
+    def construct(self,sparql:str,_user_frame=2,graph=None,**kwargs):
         """
         Perform a SPARQL CONSTRUCT query,  making the same substitutions as
         the select method.  Returns a Graph
 
-        :param sparql: SPARQL SELECT query
+        If a `graph` is given the triples are added to it,  which saves copying them out of a new Graph;  it may
+        also be an rdflib Store,  which is wrapped in a Graph.
+
+        :param sparql: SPARQL CONSTRUCT query
+        :param graph: Graph or Store to add the triples to,  None for a new Graph
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: result as a Graph
+        """
+        return self._exec_raw(sparql,self._construct,_user_frame,graph=graph,**kwargs)
+
+    def describe(self,sparql:str,_user_frame=2,graph=None,**kwargs):
+        """
+        Perform a SPARQL DESCRIBE query,  making the same substitutions as
+        the select method.  Returns a Graph
+
+        :param sparql: SPARQL DESCRIBE query
+        :param graph: Graph or Store to add the triples to,  None for a new Graph
         :param kwargs: any keyword arguments are implementation-dependent
         :return: result as a Graph
         """
-        return self._exec_raw(sparql,self._construct,_user_frame,**kwargs)
+        return self._exec_raw(sparql,self._construct,_user_frame,graph=graph,**kwargs)
+
+    def add_listener(self,listener):
+        """
+        Have `listener` called with a :class:`QueryTiming` after each query made through this endpoint,  including
+        updates,  on the thread that made the query.  Timing costs next to nothing while an endpoint has no
+        listeners.
+
+        :param listener: function of one argument
+        :return: nothing
+        """
+        self._listeners = self._listeners+(listener,)
+
+    def remove_listener(self,listener):
+        """
+        Stop calling a listener added with `add_listener`
+
+        :param listener: the listener
+        :return: nothing
+        """
+        self._listeners = tuple(x for x in self._listeners if x!=listener)
+
+    def enable_stats(self,window=1000) -> "QueryStats":
+        """
+        Start keeping rolling statistics on the queries made through this endpoint,  which are then available as
+        the `stats` attribute,  eg. ``endpoint.stats.summary()``
+
+        :param window: number of recent queries to take latency percentiles and averages over
+        :return: the :class:`QueryStats`
+        """
+        if self.stats is None:
+            self.stats = QueryStats(window)
+            self.add_listener(self.stats)
+        return self.stats
+
+    def trace(self) -> "QueryTrace":
+        """
+        Record the timing of every query from now until the trace is stopped,  for instance over a block of
+        notebook cells.  This can also be used as a context manager,  as in ``with endpoint.trace() as trace:``
 
-    def _exec_raw(self,sparql:str,operation,_user_frame=1,**kwargs):
+        :return: a :class:`QueryTrace` that has been started
+        """
+        return QueryTrace(self).start()
+
+    def _timed(self, operation:str):
+        if not self._listeners:
+            return _untimed
+        return _TimingScope(self, operation)
+
+    def _phase(self, name:str):
+        if not self._listeners:
+            return _untimed
+        timing = getattr(_timing_state, "current", None)
+        return _untimed if timing is None else _PhaseScope(timing, name)
+
+    def _note(self, **values):
+        if self._listeners:
+            timing = getattr(_timing_state, "current", None)
+            if timing is not None:
+                timing.__dict__.update(values)
+
+    def _notify(self, timing:QueryTiming):
+        for listener in self._listeners:
+            listener(timing)
+
+    def _exec_raw(self,sparql:str,operation,_user_frame=1,_batch_size=None,_workers=1,_cached=False,**kwargs):
+        with self._timed(operation.__name__):
+            with self._phase("parse"):
+                template = self._prepare_query(sparql)
+            with self._phase("substitute"):
+                if "bindings" in kwargs:
+                    bindings = kwargs["bindings"]
+                else:
+                    bindings = self._filter_frame(_getframe(_user_frame),_compile_template(template).names)
+
+                batches = _values_batches(bindings, _batch_size)
+                queries = [self._substitute_arguments(template, x, self.prefixes) for x in batches]
+            if len(queries)>1:
+                return self._select_batches(queries, _workers, **kwargs)
+            if any(isinstance(x,_values_types) for x in bindings.values()):
+                # the VALUES blocks are only in the text of the query,  so the template cannot stand in for it
+                return self._run_operation(queries[0], operation, _cached, **kwargs)
+            return self._run_operation(queries[0], operation, _cached, _template=template, _bindings=bindings, **kwargs)
+
+    def _select_batches(self, queries, workers, **kwargs) -> pd.DataFrame:
+        # the values are already in the queries,  so they need not be sent along to the workers
+        kwargs.pop("bindings", None)
+        if workers>1:
+            with self._select_many_executor(workers) as (executor,task):
+                frames = list(executor.map(partial(task, **kwargs), queries))
+        else:
+            frames = [self._run_select_frame(x, **kwargs) for x in queries]
+        # empty frames have object columns that would spoil the types of the others
+        return pd.concat([x for x in frames if len(x)] or frames[:1], ignore_index=True)
+
+    def _prepare_query(self, sparql:str) -> str:
+        from pyparsing import ParseException
         try:
-            sparql = self._process_namespaces(sparql, _parseQuery)
+            return self._process_namespaces(sparql)
         except ParseException as x:
             lines= self._error_header()
             lines += [
@@ -547,16 +1506,44 @@ class Endpoint(metaclass=ABCMeta):
             lines += error_lines
             GastrodonException.throw("Error parsing SPARQL query",lines=lines,inner_exception=x)
 
-        if "bindings" in kwargs:
-            bindings = kwargs["bindings"]
-        else:
-            bindings = self._filter_frame(_getframe(_user_frame))
+    def _run_operation(self, sparql:str, operation, _cached=False, **kwargs):
+        if self.cache is not None and _cached:
+            key = (self._store_identity(), self._view_identity(), operation.__name__, sparql)
+            result = self.cache.get(key)
+            if result is None:
+                result = self._run_uncached(sparql, operation, **kwargs)
+                self.cache.put(key, result)
+                result = _share(result)
+            else:
+                self._note(sparql=sparql, cached=True, rows=_result_rows(result))
+            return result
+        return self._run_uncached(sparql, operation, **kwargs)
+
+    def _store_identity(self):
+        return ("endpoint",self._serial)
 
-        sparql = self._substitute_arguments(sparql, bindings, self.prefixes)
+    def _invalidate(self):
+        # after an update,  drop the results cached for the graph it changed
+        if self.cache is not None:
+            self.cache.invalidate(self._store_identity())
+
+    def _view_identity(self):
+        # results converted to Python depend on the prefixes and base URI we see the graph through,  and the
+        # prefixes are read when the endpoint is made
+        return (self._serial,self.base_uri)
+
+    def _run_uncached(self, sparql:str, operation, **kwargs):
+        from pyparsing import ParseException
         try:
             if "_inject_post_substitute_fault" in kwargs:
                 sparql=kwargs["_inject_post_substitute_fault"]
-            result = operation(sparql, **kwargs)
+            with self._timed(operation.__name__) as timing:
+                if timing is not None:
+                    timing.sparql = sparql
+                with self._phase("execute"):
+                    result = operation(sparql, **kwargs)
+                if timing is not None:
+                    timing.rows = _result_rows(result)
         except ParseException as x:
             lines= self._error_header()
             lines += [
@@ -602,98 +1589,665 @@ class Endpoint(metaclass=ABCMeta):
         :param kwargs: dependent on implementation
         :return: nothing
         """
+        from pyparsing import ParseException
+        with self._timed("update") as timing:
+            try:
+                with self._phase("parse"):
+                    sparql = self._process_namespaces(sparql, update=True)
+            except ParseException as x:
+                lines = self._error_header()
+                lines += [
+                    "Failure parsing SPARQL update statement supplied by caller;  this is either a user error or ",
+                    "an error in a function that generated this query.  Query text follows:",
+                    ""
+                ]
+                error_lines = self._mark_query(sparql, x)
+                lines += error_lines
+                GastrodonException.throw("Error parsing SPARQL query", lines=lines, inner_exception=x)
+
+            with self._phase("substitute"):
+                if "bindings" in kwargs:
+                    bindings = kwargs["bindings"]
+                else:
+                    bindings=self._filter_frame(_getframe(_user_frame),_compile_template(sparql).names)
+                sparql = self._substitute_arguments(sparql, bindings, self.prefixes)
+            if timing is not None:
+                timing.sparql = sparql
+            try:
+                with self._phase("execute"):
+                    return self._update(sparql,**kwargs)
+            finally:
+                self._invalidate()
+
+    def insert_frame(self,frame:pd.DataFrame,subject=None,predicate_map=None,graph=None,batch_bytes=1000000,
+                     workers=1,retries=2,**kwargs) -> int:
+        """
+        Write the rows of a DataFrame into the endpoint,  adding one triple for each cell that is not null.  The
+        subject of the triple comes from the `subject` column (or the index),  the predicate from `predicate_map`
+        and the object is the value of the cell,  converted to RDF the same way as values substituted into queries.
+
+        Subjects and predicates may be given as URIRefs,  blank nodes,  :class:`GastrodonURI` or :class:`QName`
+        objects;  a plain str is read as a qualified name if its prefix is declared for this endpoint,  as a full
+        URI if it has a scheme and otherwise as a URI relative to `base_uri`.  Without a `base_uri`,  columns whose
+        names are not URIs must be mapped with `predicate_map`.  A ValueError is raised for a subject or predicate
+        that is not a URI,  such as a number from the default index.
+
+        The triples are sent as INSERT DATA updates of at most about `batch_bytes` characters each,  `workers` at a
+        time;  a batch that fails with a server or connection error is sent again up to `retries` times.  A
+        :class:`LocalEndpoint` adds the triples to its graph directly without writing any SPARQL.
+
+        :param frame: Pandas DataFrame
+        :param subject: name of the column that holds the subjects,  None to use the index
+        :param predicate_map: dict mapping column names to predicates;  None maps every other column to the
+            predicate named by the column
+        :param graph: URI of the named graph to insert into,  None for the default graph
+        :param batch_bytes: approximate size of each INSERT DATA update
+        :param workers: number of updates to send at once
+        :param retries: number of times to retry a failed update
+        :param kwargs: dependent on implementation
+        :return: number of triples written
+        """
+        if predicate_map is None:
+            predicate_map={x:x for x in frame.columns if x!=subject}
+        triples=self._frame_triples(frame,subject,predicate_map)
         try:
-            sparql = self._process_namespaces(sparql, _parseUpdate)
-        except ParseException as x:
-            lines = self._error_header()
-            lines += [
-                "Failure parsing SPARQL update statement supplied by caller;  this is either a user error or ",
-                "an error in a function that generated this query.  Query text follows:",
-                ""
-            ]
-            error_lines = self._mark_query(sparql, x)
-            lines += error_lines
-            GastrodonException.throw("Error parsing SPARQL query", lines=lines, inner_exception=x)
-
-        if "bindings" in kwargs:
-            bindings = kwargs["bindings"]
+            return self._insert_triples(triples,graph,batch_bytes=batch_bytes,workers=workers,retries=retries,**kwargs)
+        finally:
+            self._invalidate()
+
+    def _frame_triples(self,frame:pd.DataFrame,subject,predicate_map):
+        subjects=frame.index.to_series() if subject is None else frame[subject]
+        subjects=[self._as_uri(x) if present else None
+                  for (x,present) in zip(subjects.tolist(),subjects.notna().tolist())]
+        columns=[
+            (self._as_uri(predicate),frame[column].tolist(),frame[column].notna().tolist())
+            for (column,predicate) in predicate_map.items()
+        ]
+        for (row,s) in enumerate(subjects):
+            if s is None:
+                continue
+            for (p,values,present) in columns:
+                if present[row]:
+                    yield (s,p,self._to_rdf(values[row],self.prefixes))
+
+    def _as_uri(self,value):
+        if type(value)==str:
+            head=value.split(":",1)[0]
+            if ":" in value and head in self._namespace_of:
+                value=QName(value)
+            elif urlsplit(value).scheme:
+                value=URIRef(value)
+            elif self.base_uri:
+                value=URIRef(urljoin(self.base_uri,value))
+            else:
+                raise ValueError("%r is not a URI;  map it with predicate_map or give the endpoint a base_uri" % value)
+        term=self._to_rdf(value,self.prefixes)
+        if not isinstance(term,(URIRef,BNode)):
+            raise ValueError("%r is not a URI,  so cannot be the subject or predicate of a triple" % (value,))
+        return term
+
+    def _insert_triples(self,triples,graph,batch_bytes,workers,retries,**kwargs) -> int:
+        if graph is None:
+            (head,tail)=("INSERT DATA {\n","}")
         else:
-            bindings=self._filter_frame(_getframe(_user_frame))
-        sparql = self._substitute_arguments(sparql, bindings, self.prefixes)
-        return self._update(sparql,**kwargs)
+            (head,tail)=("INSERT DATA { GRAPH %s {\n" % self._as_uri(graph).n3(),"} }")
+        batches=_insert_batches(triples,head,tail,batch_bytes)
+        send=partial(self._insert_batch,retries=retries,**kwargs)
+        if workers>1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return sum(executor.map(send,batches))
+        return sum(send(x) for x in batches)
+
+    def _insert_batch(self,batch,retries=0,**kwargs) -> int:
+        (sparql,count)=batch
+        attempt=0
+        while True:
+            try:
+                with self._timed("insert") as timing:
+                    if timing is not None:
+                        (timing.sparql,timing.rows)=(sparql,count)
+                    with self._phase("execute"):
+                        self._update(sparql,**kwargs)
+                return count
+            except self._transient_errors:
+                if attempt>=retries:
+                    raise
+                time.sleep(self.retry_delay*2**attempt)
+                attempt+=1
+
+    def _filter_frame(self,that:FrameType,names=None):
+        local_variables = that.f_locals
+        if names is not None:
+            # look up just the variables the query mentions rather than copying every local
+            found = {}
+            for name in names:
+                if name.startswith("_") and name[1:] and not name[1:].startswith("_") \
+                        and name[1:] in local_variables:
+                    value = local_variables[name[1:]]
+                    if type(value) not in _cannot_substitute:
+                        found[name] = value
+            return found
 
-    def _filter_frame(self,that:FrameType):
         return {
             "_"+k:v for (k,v)
-                in that.f_locals.items()
+                in local_variables.items()
                 if type(v) not in _cannot_substitute
                    and not k.startswith("_")
         }
 
-class RemoteEndpoint(Endpoint):
+class _ClosingIterator:
     """
-        Represents a SPARQL endpoint available under the SPARQL Protocol.
+        Iterator that closes a resource,  such as an HTTP response,  once it is used up,  closed or garbage
+        collected.  Unlike a generator,  which only runs its finally block if it has been started,  this also closes
+        the resource when iteration never begins.
 
-        :param url: String URL for the SPARQL endpoint
-        :param prefixes: Graph containing prefix declarations for this endpoint
-        :param http_auth: http authentication method (eg. "BASIC", "DIGEST")
-        :param default_graph: str URL for default graph
-        :param base_uri: str for base URI for purposes of name resolution
+        :param items: iterator to draw items from
+        :param resource: object with a `close` method
     """
-    def __init__(self,url:str,prefixes:Graph=None,user=None,passwd=None,http_auth=None,default_graph=None,base_uri=None):
-        super().__init__(prefixes,base_uri)
-        self.url=url
-        self.user=user
-        self.passwd=passwd
-        self.http_auth=http_auth
-        self.default_graph=default_graph
-
-    def _jsonToNode(self, jsdata):
-        type = jsdata["type"]
-        value = jsdata["value"]
-        if type == "uri":
-            return URIRef(value)
-        if type == "typed-literal":
-            return Literal(value, datatype=jsdata["datatype"])
-        if type == "literal":
-            return Literal(value)
-        if type == "bnode":
-            return BNode(value)
-        return None
+    def __init__(self,items,resource):
+        self._items=items
+        self._finalizer=weakref.finalize(self,resource.close)
 
-    def _jsonToPython(self, jsdata):
-        return self.to_python(self._jsonToNode(jsdata))
+    def __iter__(self):
+        return self
 
-    def _bnode_to_sparql(self, bnode):
-        return URIRef(bnode.to_python())
+    def __next__(self):
+        try:
+            return next(self._items)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        close=getattr(self._items,"close",None)
+        if close is not None:
+            close()
+        self._finalizer()
+
+class _JSONResultReader:
+    """
+        Reads a SPARQL JSON result document from a binary stream a block at a time,  yielding the binding rows
+        one by one without holding the whole document in memory.
 
-    def _update(self, sparql,**kwargs):
-        that = self._wrapper()
-        that.setQuery(sparql)
-        that.setReturnFormat(JSON)
-        that.setMethod("POST")
-        result = that.queryAndConvert()
-        return
+        The `vars` attribute is filled in as soon as the head of the document has been read;  servers normally send
+        the head first,  but the reader does not depend on it.
 
-    def _wrapper(self):
-        sparql_wrapper = SPARQLWrapper(self.url)
-        sparql_wrapper.user=self.user
-        sparql_wrapper.passwd=self.passwd
-        if self.default_graph:
-            sparql_wrapper.addDefaultGraph(self.default_graph)
-        if self.http_auth:
+        :param stream: file-like object returning bytes,  such as an HTTP response
+        :param block_size: number of bytes to read at a time
+    """
+    def __init__(self,stream,block_size=65536):
+        self.stream=stream
+        self.block_size=block_size
+        self.vars=None
+        self._decoder=codecs.getincrementaldecoder("utf-8")()
+        self._buffer=""
+        self._pos=0
+        self._eof=False
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek()=="}":
+            return
+        while True:
+            key=self._value()
+            self._expect(":")
+            if key=="results":
+                yield from self._results()
+            else:
+                value=self._value()
+                if key=="head":
+                    self.vars=value.get("vars",[])
+            if not self._more("}"):
+                return
+
+    def _results(self):
+        self._expect("{")
+        if self._peek()=="}":
+            self._pos+=1
+            return
+        while True:
+            key=self._value()
+            self._expect(":")
+            if key=="bindings":
+                self._expect("[")
+                if self._peek()=="]":
+                    self._pos+=1
+                else:
+                    while True:
+                        yield self._value()
+                        if not self._more("]"):
+                            break
+            else:
+                self._value()
+            if not self._more("}"):
+                return
+
+    def _more(self,close):
+        if self._peek()==",":
+            self._pos+=1
+            return True
+        self._expect(close)
+        return False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        block=self.stream.read(self.block_size)
+        self._eof=not block
+        self._buffer=self._buffer[self._pos:]+self._decoder.decode(block,final=self._eof)
+        self._pos=0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos=_json_whitespace.match(self._buffer,self._pos).end()
+            if self._pos<len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of SPARQL JSON result")
+
+    def _expect(self,char):
+        if self._peek()!=char:
+            raise ValueError("Expected %r at %r in SPARQL JSON result" % (char,self._buffer[self._pos:self._pos+40]))
+        self._pos+=1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                (value,end)=_json_decoder.raw_decode(self._buffer,self._pos)
+                # a number that ends the buffer might continue in the next block
+                if end<len(self._buffer) or self._eof:
+                    self._pos=end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+class _ConnectionPool:
+    """
+        Keeps HTTP connections open between requests so that consecutive requests to the same server reuse them
+        instead of paying for a new TCP (and TLS) handshake each time.
+
+        The pool is safe to share between threads.  At most `max_connections` connections to any one server are
+        open at once;  a thread that wants another blocks until one is returned,  or until the timeout of its request
+        runs out.  A response that is garbage collected without being read or closed gives its connection back.
+
+        :param max_connections: maximum number of open connections per server
+    """
+    def __init__(self,max_connections=10):
+        self.max_connections=max_connections
+        self.requests=0
+        self.connections=0
+        self.reused=0
+        self._lock=threading.Condition()
+        self._idle={}
+        self._open={}
+
+    def stats(self):
+        """
+        :return: dict with counts of requests made,  connections opened,  requests that reused an open
+            connection and connections currently idle
+        """
+        with self._lock:
+            return dict(
+                requests=self.requests,
+                connections=self.connections,
+                reused=self.reused,
+                idle=sum(len(x) for x in self._idle.values())
+            )
+
+    def close(self):
+        """
+        Close all idle connections
+        """
+        with self._lock:
+            for (key,idle) in self._idle.items():
+                for connection in idle:
+                    connection.close()
+                self._open[key]-=len(idle)
+            self._idle.clear()
+            self._lock.notify_all()
+
+    def urlopen(self,request:urllib.request.Request,timeout=None):
+        """
+        Send a request built for :func:`urllib.request.urlopen` over a pooled connection.  Like `urlopen`,  this
+        raises :class:`urllib.error.HTTPError` for an error status.  Redirects are handed over to `urlopen`.
+
+        :param request: the request
+        :param timeout: socket timeout in seconds,  None to block
+        :return: file-like response which gives its connection back to the pool once it has been read to the end
+        """
+        parts=urlsplit(request.full_url)
+        key=(parts.scheme,parts.hostname,parts.port)
+        headers=dict(request.header_items())
+        if timeout is None:
+            timeout=socket.getdefaulttimeout()
+        while True:
+            (connection,reused)=self._acquire(key,timeout)
+            sent=False
+            try:
+                connection.request(request.get_method(),request.selector,body=request.data,headers=headers)
+                sent=True
+                response=connection.getresponse()
+                break
+            except ConnectionError:
+                # the server may have dropped a connection that sat idle;  retry those on a fresh connection,  unless
+                # the request was an update that the server may have received and carried out
+                self._release(key,connection,False)
+                if not reused or (sent and not _idempotent(request)):
+                    raise
+            except BaseException:
+                self._release(key,connection,False)
+                raise
+
+        with self._lock:
+            self.requests+=1
+
+        if response.status>=300:
+            body=response.read()
+            self._release(key,connection,not response.will_close)
+            if response.status<400:
+                return urllib.request.urlopen(request,timeout=timeout) if timeout else urllib.request.urlopen(request)
+            raise HTTPError(request.full_url,response.status,response.reason,response.headers,io.BytesIO(body))
+
+        return _PooledResponse(self,key,connection,response,request.full_url)
+
+    def _acquire(self,key,timeout):
+        deadline=None if timeout is None else time.monotonic()+timeout
+        with self._lock:
+            while True:
+                idle=self._idle.get(key)
+                if idle:
+                    self.reused+=1
+                    connection=idle.pop()
+                    if connection.sock:
+                        connection.sock.settimeout(timeout)
+                    return (connection,True)
+                if self._open.get(key,0)<self.max_connections:
+                    self._open[key]=self._open.get(key,0)+1
+                    self.connections+=1
+                    break
+                if deadline is None:
+                    self._lock.wait()
+                elif not self._lock.wait(deadline-time.monotonic()):
+                    raise socket.timeout("timed out waiting for a connection to %s" % key[1])
+
+        (scheme,host,port)=key
+        connection_class=http.client.HTTPSConnection if scheme=="https" else http.client.HTTPConnection
+        return (connection_class(host,port,timeout=timeout),False)
+
+    def _release(self,key,connection,reusable):
+        with self._lock:
+            if reusable:
+                self._idle.setdefault(key,[]).append(connection)
+            else:
+                connection.close()
+                self._open[key]-=1
+            self._lock.notify()
+
+class _PooledResponse:
+    """
+        Wraps an :class:`http.client.HTTPResponse` to look like the response returned by `urlopen` and to give the
+        connection back to the pool once the body has been read.  A response that is closed or garbage collected
+        before being read to the end closes its connection.
+    """
+    def __init__(self,pool,key,connection,response,url):
+        self._pool=pool
+        self._key=key
+        self._connection=connection
+        self._response=response
+        self.url=url
+        self._finalizer=weakref.finalize(self,_drop_connection,pool,key,connection,response)
+
+    def read(self,amt=None):
+        data=self._response.read(amt)
+        self._check_done()
+        return data
+
+    def readline(self,limit=-1):
+        line=self._response.readline(limit)
+        self._check_done()
+        return line
+
+    def __iter__(self):
+        return iter(self.readline,b"")
+
+    def __next__(self):
+        line=self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def info(self):
+        return self._response.headers
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self._response.status
+
+    def close(self):
+        if self._connection:
+            self._connection=None
+            self._finalizer()
+
+    def _check_done(self):
+        if self._connection and self._response.isclosed():
+            self._finalizer.detach()
+            self._pool._release(self._key,self._connection,not self._response.will_close)
+            self._connection=None
+
+    def __getattr__(self,name):
+        return getattr(self._response,name)
+
+def _drop_connection(pool:_ConnectionPool,key,connection,response):
+    response.close()
+    pool._release(key,connection,False)
+
+def _idempotent(request:urllib.request.Request) -> bool:
+    '''
+    :return: true if the request can safely be sent twice,  as a SPARQL query can but an update cannot
+    '''
+    if request.get_method() in ("GET","HEAD"):
+        return True
+    content_type=request.get_header("Content-type") or ""
+    if not request.data or "form-urlencoded" not in content_type:
+        return False
+    return "update" not in parse_qs(request.data.decode("utf-8"))
+
+@lru_cache(maxsize=None)
+def _pooled_wrapper_class():
+    """
+    :return: SPARQLWrapper subclass that sends its requests through a :class:`_ConnectionPool`.  DIGEST
+        authentication and servers reached through a proxy still go through `urlopen`,  since those depend on urllib
+        handlers.  The class is defined the first time a pooled RemoteEndpoint needs it,  so that SPARQLWrapper is
+        only imported then.
+    """
+    from SPARQLWrapper import SPARQLWrapper, DIGEST
+    from SPARQLWrapper.SPARQLExceptions import QueryBadFormed, EndPointNotFound, Unauthorized, URITooLong, \
+        EndPointInternalError
+
+    class _PooledSPARQLWrapper(SPARQLWrapper):
+        def __init__(self,endpoint,pool:_ConnectionPool,**kwargs):
+            super().__init__(endpoint,**kwargs)
+            self.pool=pool
+
+        def _query(self):
+            host=urlsplit(self.endpoint).hostname
+            if (self.http_auth==DIGEST and self.user) or \
+                    (urllib.request.getproxies() and not urllib.request.proxy_bypass(host)):
+                return super()._query()
+
+            request=self._createRequest()
+            try:
+                return (self.pool.urlopen(request,self.timeout),self.returnFormat)
+            except HTTPError as e:
+                if e.code == 400:
+                    raise QueryBadFormed(e.read())
+                elif e.code == 404:
+                    raise EndPointNotFound(e.read())
+                elif e.code == 401:
+                    raise Unauthorized(e.read())
+                elif e.code == 414:
+                    raise URITooLong(e.read())
+                elif e.code == 500:
+                    raise EndPointInternalError(e.read())
+                else:
+                    raise e
+
+    return _PooledSPARQLWrapper
+
+class RemoteEndpoint(Endpoint):
+    """
+        Represents a SPARQL endpoint available under the SPARQL Protocol.
+
+        :param url: String URL for the SPARQL endpoint
+        :param prefixes: Graph containing prefix declarations for this endpoint
+        :param http_auth: http authentication method (eg. "BASIC", "DIGEST")
+        :param default_graph: str URL for default graph
+        :param base_uri: str for base URI for purposes of name resolution
+        :param keep_alive: if true,  keep HTTP connections open and reuse them for later requests
+        :param max_connections: maximum number of connections this endpoint keeps open at once
+        :param cache: :class:`ResultCache` used to remember the results of SELECT queries,  None to not cache
+        :param result_format: format to ask the endpoint for when fetching `select` and `select_iter` results,  one
+            of "json",  "tsv",  "csv" or "xml"
+        :param disk_cache: :class:`DiskCache` used to keep the results of `select` and `construct` between sessions,
+            None to not keep them
+
+        The query methods of a :class:`RemoteEndpoint` accept a `timeout` keyword argument giving a socket timeout
+        in seconds for that query.
+
+        SPARQL 1.1 TSV results are read by the pandas C parser and decoded a column at a time;  URIs are shortened
+        and typed literals converted just as they are for JSON.  CSV results are faster still but carry no types:
+        numbers come back as pandas reads them and everything else,  URIs included,  as plain strings.  If the
+        endpoint answers in a different format than the one asked for,  the result is read in the format it used.
+    """
+    peel_batch_size=200
+
+    def __init__(self,url:str,prefixes:Graph=None,user=None,passwd=None,http_auth=None,default_graph=None,base_uri=None,
+                 keep_alive=True,max_connections=10,cache:ResultCache=None,result_format="json",
+                 disk_cache:DiskCache=None):
+        if result_format not in _result_formats:
+            raise ValueError("result_format must be one of %s" % ", ".join(_result_formats))
+        super().__init__(prefixes,base_uri,cache)
+        self.result_format=result_format
+        self.url=url
+        self.user=user
+        self.passwd=passwd
+        self.http_auth=http_auth
+        self.default_graph=default_graph
+        self.disk_cache=disk_cache
+        self._pool=_ConnectionPool(max_connections) if keep_alive else None
+        self._peel_lock=threading.Lock()
+        self._peel_counts=Counter(peels=0,levels=0,round_trips=0,nodes=0)
+
+    def connection_stats(self):
+        """
+        Statistics on HTTP connection reuse for this endpoint,  for example
+        ``{'requests': 120, 'connections': 4, 'reused': 116, 'idle': 4}``
+
+        :return: dict of statistics,  or None if connections are not kept alive
+        """
+        return self._pool.stats() if self._pool else None
+
+    def close(self):
+        """
+        Close the HTTP connections kept open by this endpoint.  The endpoint can still be used afterwards.
+
+        :return: nothing
+        """
+        if self._pool:
+            self._pool.close()
+
+    def _store_identity(self):
+        return ("remote",self.url,self.default_graph)
+
+    def _invalidate(self):
+        super()._invalidate()
+        if self.disk_cache is not None:
+            self.disk_cache.invalidate(self._store_identity())
+
+    def _view_identity(self):
+        # CSV results carry no types,  so they convert differently
+        return super()._view_identity()+(self.result_format,)
+
+    def _jsonToNode(self, jsdata):
+        type = jsdata["type"]
+        value = jsdata["value"]
+        if type == "uri":
+            return URIRef(value)
+        if type == "typed-literal":
+            return Literal(value, datatype=jsdata["datatype"])
+        if type == "literal":
+            # SPARQL 1.1 writes typed literals as literals with a datatype
+            return Literal(value, datatype=jsdata.get("datatype"), lang=jsdata.get("xml:lang"))
+        if type == "bnode":
+            return BNode(value)
+        return None
+
+    def _jsonToPython(self, jsdata):
+        return self.to_python(self._jsonToNode(jsdata))
+
+    def _bnode_to_sparql(self, bnode):
+        return URIRef(str(bnode))
+
+    @property
+    def _transient_errors(self):
+        # SPARQLWrapper reports an HTTP 500 as EndPointInternalError
+        from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+        return (EndPointInternalError,)+Endpoint._transient_errors
+
+    def _update(self, sparql,**kwargs):
+        that = self._wrapper(kwargs.get("timeout"))
+        that.setQuery(sparql)
+        that.setReturnFormat("json")
+        that.setMethod("POST")
+        result = that.queryAndConvert()
+        return
+
+    def _wrapper(self,timeout=None):
+        from SPARQLWrapper import SPARQLWrapper
+        sparql_wrapper = _pooled_wrapper_class()(self.url,self._pool) if self._pool else SPARQLWrapper(self.url)
+        sparql_wrapper.user=self.user
+        sparql_wrapper.passwd=self.passwd
+        if timeout:
+            sparql_wrapper.setTimeout(math.ceil(timeout))
+        if self.default_graph:
+            sparql_wrapper.addDefaultGraph(self.default_graph)
+        if self.http_auth:
             sparql_wrapper.setHTTPAuth(self.http_auth)
         return sparql_wrapper
 
-    def peel(self,node):
+    def peel(self,node,batch_size=None,workers=1):
         """
         Copies part of a graph starting at node,  copying all facts linked at that
         node and continuing this transversal for each blank node that we find.
 
+        The blank nodes are fetched a level at a time:  all of the blank nodes found at one level are looked up
+        together with a VALUES clause,  `batch_size` at a time,  so the number of round trips grows with the depth
+        of the structure rather than with the number of blank nodes in it.
+
         :param node: URIRef starting point
+        :param batch_size: maximum number of nodes looked up by one query,  None for `peel_batch_size`
+        :param workers: number of queries for the same level to run at once
         :return: Graph object containing copied graph
         """
-        output = self._peel(node)
+        return self.peel_many([node],batch_size,workers)
+
+    def peel_many(self,nodes,batch_size=None,workers=1):
+        """
+        Copies the parts of a graph starting at each of several nodes into one graph,  as `peel` does for one node,
+        looking up the starting nodes together.
+
+        :param nodes: list of URIRef starting points
+        :param batch_size: maximum number of nodes looked up by one query,  None for `peel_batch_size`
+        :param workers: number of queries for the same level to run at once
+        :return: Graph object containing copied graph
+        """
+        output = self._peel(nodes,batch_size or self.peel_batch_size,workers)
         nodes=all_uri(output)
         used_ns = {URIRef(self.ns_part(x)) for x in nodes if x.startswith('http')}
         ns_decl = [ns for ns in self.prefixes.namespaces() if ns[1] in used_ns]
@@ -701,79 +2255,401 @@ class RemoteEndpoint(Endpoint):
             output.namespace_manager.bind(*x)
         return output
 
-    def _peel(self, node):
+    def peel_stats(self):
+        """
+        Statistics on the work done by `peel` and `peel_many` on this endpoint,  for example
+        ``{'peels': 3, 'levels': 9, 'round_trips': 11, 'nodes': 1450}``,  where `nodes` counts the starting and blank
+        nodes looked up
+
+        :return: dict of statistics
+        """
+        with self._peel_lock:
+            return dict(self._peel_counts)
+
+    def _peel(self, roots, batch_size, workers):
         output = Graph()
-        query = """
-            SELECT (?that as ?s) ?p ?o {
-                ?that ?p ?o .
-            }
-        """
-        items = self._select(query, bindings={"that": node})
-        bnodes = set()
-        q = deque()
-        urins = set()
-        while True:
-            for x in items["results"]["bindings"]:
-                s = self._jsonToNode(x["s"])
-                p = self._jsonToNode(x["p"])
-                o = self._jsonToNode(x["o"])
-                if isinstance(s, URIRef):
-                    urins.add(self.ns_part(s))
-                if isinstance(p, URIRef):
-                    urins.add(self.ns_part(p))
-                if isinstance(p, URIRef):
-                    urins.add(self.ns_part(o))
-
-                output.add((s, p, o))
-                if isinstance(o, BNode) and o not in bnodes:
-                    bnodes.add(o)
-                    q.append(o)
-
-            if not q:
-                return output
-
-            # note that the detailed behavior of blank nodes tends to be different in different triple stores,
-            # in particular,  although almost all triple stores have some way to refer to a blank node inside the
-            # triple store,  there is no standard way to do this.
-            #
-            # This works with Virtuoso but I tried a number of things that don't work (such as putting a list of
-            # nodeId's in the form <nodeID://b506362> in an IN clause in a FILTER statement) or things that work but
-            # are too slow (filtering on STR(?s))
-
-            items = self._select(query,bindings={"that":q.popleft()})
+        seen = set(roots)
+        frontier = list(dict.fromkeys(roots))
+        self._count_peel(peels=1)
+        while frontier:
+            batches = [frontier[start:start+batch_size] for start in range(0,len(frontier),batch_size)]
+            self._count_peel(levels=1, round_trips=len(batches), nodes=len(frontier))
+            if workers>1 and len(batches)>1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(self._peel_batch, batches))
+            else:
+                results = [self._peel_batch(x) for x in batches]
+
+            frontier = []
+            for facts in results:
+                for fact in facts:
+                    output.add(fact)
+                    o = fact[2]
+                    if isinstance(o, BNode) and o not in seen:
+                        seen.add(o)
+                        frontier.append(o)
+        return output
+
+    def _peel_batch(self, nodes):
+        # note that the detailed behavior of blank nodes tends to be different in different triple stores,
+        # in particular,  although almost all triple stores have some way to refer to a blank node inside the
+        # triple store,  there is no standard way to do this.
+        #
+        # _bnode_to_sparql writes a blank node the way this endpoint can refer to it;  the default works with
+        # Virtuoso,  where IN clauses of nodeID's in a FILTER didn't work and filtering on STR(?s) was too slow,  but
+        # a VALUES clause of <nodeID://b506362> references does.
+        values = " ".join(self._to_rdf(x, self.prefixes).n3() for x in nodes)
+        query = "SELECT ?s ?p ?o { VALUES ?s { %s } ?s ?p ?o }" % values
+        result = self._run_uncached(query, self._select)
+        (s,p,o) = (Variable("s"),Variable("p"),Variable("o"))
+        return [(x[s],x[p],x[o]) for x in result.bindings]
+
+    def _count_peel(self, **counts):
+        with self._peel_lock:
+            for (name,count) in counts.items():
+                self._peel_counts[name] += count
 
     def _select(self, sparql:str,**kwargs) -> SPARQLResult:
-        that = self._wrapper()
+        from rdflib.plugins.sparql.processor import SPARQLResult
+        that = self._wrapper(kwargs.get("timeout"))
         that.setQuery(sparql)
-        that.setReturnFormat(JSON)
+        that.setReturnFormat("json")
         json_result=that.queryAndConvert()
-        res={}
-        res["type_"] = "SELECT"
-        res["vars_"] = [Variable(v) for v in json_result["head"]["vars"]]
-        column = OrderedDict()
-        bindings=[]
-        for json_row in json_result["results"]["bindings"]:
-            rdf_row={}
-            for variable in res["vars_"]:
-                if str(variable) in json_row:
-                    rdf_row[variable]=self._jsonToNode(json_row[str(variable)])
-                else:
-                    rdf_row[variable]=None
-            bindings.append(rdf_row)
-        res["bindings"]=bindings
-        return SPARQLResult(res)
+        with self._phase("decode"):
+            res={}
+            res["type_"] = "SELECT"
+            res["vars_"] = [Variable(v) for v in json_result["head"]["vars"]]
+            column = OrderedDict()
+            bindings=[]
+            for json_row in json_result["results"]["bindings"]:
+                rdf_row={}
+                for variable in res["vars_"]:
+                    if str(variable) in json_row:
+                        rdf_row[variable]=self._jsonToNode(json_row[str(variable)])
+                    else:
+                        rdf_row[variable]=None
+                bindings.append(rdf_row)
+            res["bindings"]=bindings
+            return SPARQLResult(res)
+
+    def _select_frame(self, sparql:str, **kwargs) -> pd.DataFrame:
+        if self.disk_cache is not None:
+            return self._disk_select_frame(sparql, **kwargs)
+
+        # the result is decoded straight into columns,  without building a SPARQLResult as select_raw does
+        (returned,body) = self._fetch_body(sparql, kwargs.get("timeout"))
+        with self._phase("decode"):
+            if returned=="json":
+                json_result = json.loads(body.decode("utf-8"))
+                return self._json_frame(json_result["head"]["vars"], json_result["results"]["bindings"])
+            if returned=="xml":
+                return self._dataframe(Result.parse(io.BytesIO(body), format="xml"))
+            return self._table_frame(_read_table(io.BytesIO(body), returned), returned)
+
+    def _disk_select_frame(self, sparql:str, **kwargs) -> pd.DataFrame:
+        # CSV results carry no types,  so they are kept apart from the others
+        key = ("select", self.result_format=="csv", sparql)
+        with self._phase("decode"):
+            columns = self.disk_cache.get(self._store_identity(), key, ".parquet", _read_columns)
+        if columns is not None:
+            self._note(cached=True)
+        else:
+            (returned,body) = self._fetch_body(sparql, kwargs.get("timeout"))
+            with self._phase("decode"):
+                columns = self._body_columns(returned, body)
+                self.disk_cache.put(self._store_identity(), key, ".parquet", partial(_write_columns, columns=columns))
+        return columns if isinstance(columns, pd.DataFrame) else self._frame(columns)
+
+    def _body_columns(self, returned:str, body:bytes):
+        '''
+        :return: list of (name, keys, lexical forms) for each column of a SELECT result,  or the DataFrame of a CSV
+            result,  which has no types to keep
+        '''
+        if returned=="json":
+            json_result = json.loads(body.decode("utf-8"))
+            return list(_json_columns(json_result["head"]["vars"], json_result["results"]["bindings"]))
+        if returned=="xml":
+            result = Result.parse(io.BytesIO(body), format="xml")
+            return list(_term_columns(result.vars, result.bindings))
+        table = _read_table(io.BytesIO(body), returned)
+        return table if returned=="csv" else list(_tsv_columns(table))
+
+    def _select_iter(self, sparql:str, chunk_rows, **kwargs):
+        if self.result_format=="json":
+            that = self._wrapper(kwargs.get("timeout"))
+            that.setQuery(sparql)
+            that.setReturnFormat("json")
+            response = that.query().response
+            return _ClosingIterator(self._stream_frames(response, chunk_rows), response)
+
+        response = self._fetch(sparql, kwargs.get("timeout"))
+        returned = _response_format(response, self.result_format)
+        if returned=="json":
+            return _ClosingIterator(self._stream_frames(response, chunk_rows), response)
+        if returned=="xml":
+            try:
+                result = Result.parse(response, format="xml")
+            finally:
+                response.close()
+            return self._chunk_frames(result.vars, result.bindings, chunk_rows)
+        return _ClosingIterator(self._stream_table(response, returned, chunk_rows), response)
+
+    def _select_arrow(self, sparql:str, **kwargs):
+        (returned,body) = self._fetch_body(sparql, kwargs.get("timeout"))
+        with self._phase("decode"):
+            if returned=="json":
+                json_result = json.loads(body.decode("utf-8"))
+                columns = _json_columns(json_result["head"]["vars"], json_result["results"]["bindings"])
+            elif returned=="xml":
+                result = Result.parse(io.BytesIO(body), format="xml")
+                columns = _term_columns(result.vars, result.bindings)
+            elif returned=="csv":
+                import pyarrow.csv
+                return pyarrow.csv.read_csv(io.BytesIO(body))
+            else:
+                columns = _tsv_columns(_read_table(io.BytesIO(body), returned))
+            with self._phase("frame"):
+                return _arrow_table(columns)
+
+    def _fetch_body(self, sparql:str, timeout=None):
+        response = self._fetch(sparql, timeout)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        self._note(bytes=len(body))
+        return (_response_format(response, self.result_format),body)
+
+    def _fetch(self, sparql:str, timeout=None):
+        that = self._wrapper(timeout)
+        that.setQuery(sparql)
+        that.setReturnFormat(self.result_format)
+        that.addCustomHttpHeader("Accept", _result_formats[self.result_format])
+        return that.query().response
+
+    def _stream_table(self, response, returned, chunk_rows):
+        try:
+            for table in _read_table(response, returned, chunk_rows):
+                yield self._table_frame(table, returned)
+        finally:
+            response.close()
+
+    def _table_frame(self, table:pd.DataFrame, returned:str) -> pd.DataFrame:
+        if returned=="csv":
+            # CSV has no way to tell a URI or a number in a string from any other value
+            return table
+
+        with self._phase("frame"):
+            column = OrderedDict()
+            for name in table.columns:
+                column[name.lstrip("?$")] = self._tsv_column(table[name])
+            return pd.DataFrame(column)
+
+    def _tsv_column(self, cells:pd.Series):
+        #
+        # integer columns,  written bare in TSV,  are parsed by numpy in one pass;  otherwise each distinct cell is
+        # decoded and converted once,  as for a JSON result,  and the converted values are spread back over the rows
+        #
+        bound = cells.notna().to_numpy()
+        if bound.any() and cells[bound].iloc[0][:1] in _tsv_number_starts:
+            try:
+                return _parse_numeric_column(cells.astype(object).where(bound,None).tolist(), np.int64)
+            except (ValueError, OverflowError):
+                pass
+
+        (codes,uniques) = pd.factorize(cells)
+        terms = [_tsv_term(x) for x in uniques]
+        return _spread(self._convert_column([x[0] for x in terms],[x[1] for x in terms]),codes)
+
+    def _stream_frames(self, response, chunk_rows):
+        reader = _JSONResultReader(response)
+        rows = []
+        emitted = False
+        try:
+            for row in reader:
+                rows.append(row)
+                if len(rows)>=chunk_rows and reader.vars is not None:
+                    yield self._json_frame(reader.vars, rows)
+                    emitted = True
+                    rows = []
+        finally:
+            response.close()
+
+        if rows or not emitted:
+            yield self._json_frame(reader.vars or [], rows)
+
+    def _json_frame(self, variables, rows)->pd.DataFrame:
+        return self._frame(_json_columns(variables, rows))
+
+    def _construct(self, sparql:str,graph=None,**kwargs) -> Graph:
+        target=_target_graph(graph)
+        if _prepare(kwargs.get("_template") or sparql).parsed[1].name=="SelectQuery":
+            # a SELECT of ?s ?p ?o is also accepted,  as it was before CONSTRUCT was sent to the endpoint
+            result=self._select(sparql,**kwargs)
+            (S,P,O)=(Variable("s"),Variable("p"),Variable("o"))
+            target.addN((fact[S],fact[P],fact[O],target) for fact in result.bindings)
+            return target
+
+        if self.disk_cache is not None:
+            found = self.disk_cache.get(self._store_identity(), ("construct", sparql), ".nt",
+                                        partial(_read_ntriples, graph=target))
+            if found is not None:
+                self._note(cached=True)
+                return target
+
+        that = self._wrapper(kwargs.get("timeout"))
+        that.setQuery(sparql)
+        that.setReturnFormat("turtle")
+        that.addCustomHttpHeader("Accept",_graph_accept)
+        response = that.query().response
+        try:
+            returned = _graph_format(response)
+            if self.disk_cache is not None:
+                body = response.read()
+                if returned!="nt":
+                    body = Graph().parse(io.BytesIO(body),format=returned).serialize(format="nt",encoding="utf-8")
+                self.disk_cache.put(self._store_identity(), ("construct", sparql), ".nt", lambda file:file.write(body))
+                _parse_ntriples(io.BytesIO(body), target)
+            elif returned=="nt":
+                # N-Triples is read from the network a block at a time and added to the graph in batches
+                _parse_ntriples(response, target)
+            else:
+                target.parse(io.BytesIO(response.read()),format=returned)
+        finally:
+            response.close()
+        return target
+
+
+class AsyncRemoteEndpoint:
+    """
+        An asyncio front end to a :class:`RemoteEndpoint`.  The `select`,  `select_raw`,  `construct` and `update`
+        methods are coroutines,  so that one event loop can keep many queries in flight to the same SPARQL endpoint.
+        The synchronous :class:`RemoteEndpoint` underneath is available as the `endpoint` attribute for the local
+        methods such as `to_python` and `short_name`.
+
+        Namespaces are prepended and arguments substituted exactly as for a :class:`RemoteEndpoint`,  except that
+        there is no caller's stack frame to take variables from:  values for ``?_var`` must be passed in the
+        `bindings` dictionary,  keyed by the name of the SPARQL variable (eg. ``bindings=dict(_var=...)``).
+
+        Requests run on a private pool of `concurrency` threads sharing the endpoint's pooled HTTP connections.  If a
+        query times out or the awaiting task is cancelled,  the coroutine returns at once,  but a request already sent
+        cannot be called back:  it finishes in the background,  bounded by the socket timeout,  and keeps its place
+        among the `concurrency` queries in flight until it does.
 
-    def _construct(self, sparql:str,**kwargs) -> Graph:
-        result=self._select(sparql,**kwargs)
-        S=Variable("s")
-        P=Variable("p")
-        O=Variable("o")
-        neo=Graph()
-        for fact in result.bindings:
-            neo.add((fact[S],fact[P],fact[O]))
+        The threads and connections are kept until :meth:`aclose` (or :meth:`close`) is called,  which ``async with``
+        does on leaving its block.
 
-        return neo
+        :param url: String URL for the SPARQL endpoint
+        :param prefixes: Graph containing prefix declarations for this endpoint
+        :param concurrency: maximum number of queries in flight at once
+        :param timeout: default timeout in seconds for each query,  None for no limit
+        :param kwargs: other keyword arguments are the same as for :class:`RemoteEndpoint`
+    """
+    def __init__(self,url:str,prefixes:Graph=None,concurrency=16,timeout=None,**kwargs):
+        kwargs.setdefault("max_connections",concurrency)
+        self.endpoint=RemoteEndpoint(url,prefixes,**kwargs)
+        self.concurrency=concurrency
+        self.timeout=timeout
+        self._executor=ThreadPoolExecutor(max_workers=concurrency)
+        # asyncio objects belong to one event loop,  and each asyncio.run makes a new one
+        self._semaphores=weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,*exc_info):
+        await self.aclose()
+
+    def close(self,wait=True):
+        """
+        Stop the request threads and close the HTTP connections of the endpoint underneath.  No more queries can be
+        made afterwards.
+
+        :param wait: if true wait for the requests already running to finish
+        :return: nothing
+        """
+        self._executor.shutdown(wait=wait)
+        self.endpoint.close()
+
+    async def aclose(self):
+        """
+        Close the endpoint as :meth:`close` does,  waiting for running requests without blocking the event loop.
+
+        :return: nothing
+        """
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None,self.close)
 
+    async def select(self,sparql:str,bindings:Dict=None,timeout=None,**kwargs) -> pd.DataFrame:
+        """
+        Perform a SPARQL SELECT query
+
+        :param sparql: SPARQL SELECT query
+        :param bindings: dict of values to substitute for SPARQL variables
+        :param timeout: timeout in seconds,  overriding the default for this endpoint
+        :return: SELECT result as a Pandas DataFrame
+        """
+        return await self._submit(self.endpoint.select,sparql,bindings,timeout,**kwargs)
+
+    async def select_raw(self,sparql:str,bindings:Dict=None,timeout=None,**kwargs) -> SPARQLResult:
+        """
+        Perform a SPARQL SELECT query as would the select method,  but return the original SPARQLResult
+
+        :param sparql: SPARQL SELECT query
+        :param bindings: dict of values to substitute for SPARQL variables
+        :param timeout: timeout in seconds,  overriding the default for this endpoint
+        :return: result as a SPARQLResult
+        """
+        return await self._submit(self.endpoint.select_raw,sparql,bindings,timeout,**kwargs)
+
+    async def construct(self,sparql:str,bindings:Dict=None,timeout=None,**kwargs) -> Graph:
+        """
+        Perform a SPARQL CONSTRUCT query
+
+        :param sparql: SPARQL CONSTRUCT query
+        :param bindings: dict of values to substitute for SPARQL variables
+        :param timeout: timeout in seconds,  overriding the default for this endpoint
+        :return: result as a Graph
+        """
+        return await self._submit(self.endpoint.construct,sparql,bindings,timeout,**kwargs)
+
+    async def update(self,sparql:str,bindings:Dict=None,timeout=None,**kwargs) -> None:
+        """
+        Perform a SPARQL update
+
+        :param sparql: SPARQL update,  as a str
+        :param bindings: dict of values to substitute for SPARQL variables
+        :param timeout: timeout in seconds,  overriding the default for this endpoint
+        :return: nothing
+        """
+        return await self._submit(self.endpoint.update,sparql,bindings,timeout,**kwargs)
+
+    async def _submit(self,method,sparql,bindings,timeout,**kwargs):
+        if timeout is None:
+            timeout=self.timeout
+        import asyncio
+        loop=asyncio.get_running_loop()
+        semaphore=self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore=self._semaphores[loop]=asyncio.Semaphore(self.concurrency)
+
+        call=partial(method,sparql,bindings=bindings or {},timeout=timeout,**kwargs)
+        await semaphore.acquire()
+        try:
+            future=self._executor.submit(call)
+        except BaseException:
+            semaphore.release()
+            raise
+        # the slot is given back when the thread is done with the request,  not when the caller stops waiting
+        future.add_done_callback(partial(_release_on_loop,loop,semaphore))
+        return await asyncio.wait_for(asyncio.wrap_future(future),timeout)
+
+def _release_on_loop(loop,semaphore,future):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # the event loop has been closed,  and its semaphore with it
+        pass
 
 class LocalEndpoint(Endpoint):
     '''
@@ -781,33 +2657,1226 @@ class LocalEndpoint(Endpoint):
 
         :param graph: Graph object that will be encapsulated
         :param prefixes: Graph defining prefixes for this Endpoint,  will be the same as the input graph by default
+        :param cache: :class:`ResultCache` used to remember the results of SELECT queries,  None to not cache
         :param base_uri: base_uri for resolving URLs
+
+        `select_many` and batched `select` calls run their queries one at a time unless they are given `workers`
+        greater than 1,  in which case the queries run in worker processes,  since rdflib evaluates queries in pure
+        Python.  Starting the processes and copying the graph into them takes longer than most queries,  so they are
+        only worth asking for when each query takes seconds.  The processes are started on first use,  each with a
+        copy of the endpoint and its graph,  and kept for later calls until an update is made through the endpoint
+        or :meth:`close` is called.  Changes made to the graph in any other way are not seen by workers that have
+        already started,  so call :meth:`close` after making them.
+
+        Large graphs that are loaded once and then queried are smaller and faster to query in an :class:`ArrayStore`
+        than in the default rdflib store.
     '''
 
-    def __init__(self,graph:Graph,prefixes:Graph=None):
+    # workers for a LocalEndpoint are processes,  so they are only used when asked for
+    select_workers=1
+
+    def __init__(self,graph:Graph,prefixes:Graph=None,cache:ResultCache=None,base_uri=None):
         """
 
 
         """
         if not prefixes:
             prefixes=graph
-        super().__init__(prefixes)
+        super().__init__(prefixes,base_uri,cache)
         self.graph=graph
+        self._translate=lru_cache(maxsize=256)(self._translate_query)
+        self._workers=None
+        self._workers_lock=threading.Lock()
+
+    def __getstate__(self):
+        state=super().__getstate__()
+        del state["_translate"]
+        del state["_workers"]
+        del state["_workers_lock"]
+        return state
+
+    def __setstate__(self,state):
+        super().__setstate__(state)
+        self._translate=lru_cache(maxsize=256)(self._translate_query)
+        self._workers=None
+        self._workers_lock=threading.Lock()
+
+    def close(self):
+        """
+        Stop the worker processes started by `select_many` or a batched `select`.  The endpoint can still be used
+        afterwards,  and starts new workers when it needs them.
+
+        :return: nothing
+        """
+        with self._workers_lock:
+            (workers,self._workers)=(self._workers,None)
+        if workers is not None:
+            workers[1].shutdown(wait=False)
+
+    def _invalidate(self):
+        super()._invalidate()
+        # the workers have copies of the graph from before the update
+        self.close()
+
+    def _store_identity(self):
+        return ("local",_graph_serial(self.graph))
 
     def _select(self, sparql:str,**kwargs) -> SPARQLResult:
-        return self.graph.query(sparql)
+        return self._query(sparql,**kwargs)
+
+    def _query(self, sparql:str, _template=None, _bindings=None, **kwargs):
+        #
+        # rather than have rdflib parse the substituted text again,  evaluate the algebra of the query template
+        # (translated once) with the substituted values put in place of their variables
+        #
+        (query,blanks)=(sparql,{}) if _template is None else self._bound_query(_template,_bindings)
+        with self._evaluation():
+            result=self.graph.query(query,initBindings=blanks)
+            if result.type=="SELECT":
+                # rdflib evaluates the query as the bindings are first read,  so read them here where the query is
+                # timed and the store's own evaluation is in place
+                result.bindings
+        return result
 
-    def _construct(self, sparql:str,**kwargs) -> Graph:
-        return self.graph.query(sparql)
+    def _evaluation(self):
+        return _ArrayEvaluation() if isinstance(self.graph.store,ArrayStore) else nullcontext()
+
+    def _bound_query(self, template:str, bindings:Dict):
+        query=self._translate(template)
+        names=_prepare(template).variables
+        values={Variable(x):self._to_rdf(bindings[x],self.prefixes) for x in names if x in bindings}
+        # rdflib reads a blank node in a pattern as a variable,  so blank nodes are bound as the query starts instead
+        blanks={x:y for (x,y) in values.items() if isinstance(y,BNode)}
+        values={x:y for (x,y) in values.items() if x not in blanks}
+        if values:
+            from rdflib.plugins.sparql.sparql import Query
+            query=Query(query.prologue,_bind_algebra(query.algebra,values))
+        return (query,blanks)
+
+    def profile(self,sparql:str,_user_frame=2,**kwargs) -> "QueryProfile":
+        """
+        Run a SPARQL query,  making the same substitutions as the select method,  and time each operator
+        (basic graph pattern,  join,  filter and so forth) of the rdflib query plan as it runs.  The
+        :class:`QueryProfile` returned shows the plan as a tree with,  for each operator,  the number of times it
+        was evaluated,  the number of solutions it produced and the time spent in it,  both including and not
+        including the operators below it.
+
+        Profiling slows a query down,  so compare the times with each other rather than with an ordinary run.
+
+        :param sparql: SPARQL query
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: the annotated plan
+        """
+        return self._exec_raw(sparql,self._profile,_user_frame,**kwargs)
+
+    def explain(self,sparql:str,_user_frame=2,**kwargs) -> "QueryProfile":
+        """
+        Show the rdflib query plan for a SPARQL query without running it,  making the same substitutions as the
+        select method.
+
+        :param sparql: SPARQL query
+        :param kwargs: any keyword arguments are implementation-dependent
+        :return: the plan,  as a :class:`QueryProfile` without counts or times
+        """
+        return self._exec_raw(sparql,self._explain,_user_frame,**kwargs)
+
+    def _algebra_query(self, sparql:str, _template=None, _bindings=None):
+        return (self._translate(sparql),{}) if _template is None else self._bound_query(_template,_bindings)
+
+    def _explain(self, sparql:str, _template=None, _bindings=None, **kwargs):
+        (query,blanks)=self._algebra_query(sparql,_template,_bindings)
+        return QueryProfile(_plan_rows(query.algebra,self._plan_names()),None)
+
+    def _profile(self, sparql:str, _template=None, _bindings=None, **kwargs):
+        (query,blanks)=self._algebra_query(sparql,_template,_bindings)
+        profiler=_Profiler()
+        with self._evaluation(),profiler:
+            start=time.perf_counter()
+            result=self.graph.query(query,initBindings=blanks)
+            # rdflib evaluates lazily,  so the whole result has to be read while the profiler is running
+            len(result)
+            total=time.perf_counter()-start
+        plan=_plan_rows(query.algebra,self._plan_names(),profiler.counts)
+        # the query part itself only sets up that lazy result,  so it is charged with reading all of it
+        root=plan[0]
+        below=sum(x["time"] for x in plan if x["depth"]==1)
+        root.update(rows=len(result),time=total,self_time=max(total-below,0.0))
+        return QueryProfile(plan,total,result)
+
+    def _plan_names(self):
+        return getattr(self.prefixes,"namespace_manager",None)
+
+    def _translate_query(self, sparql:str) -> Query:
+        from rdflib.plugins.sparql.algebra import translateQuery
+        from rdflib.plugins.sparql.parser import parseQuery
+        # translateQuery modifies the parse tree,  so it gets a parse of its own
+        with _parse_lock:
+            parsed=parseQuery(sparql)
+        return translateQuery(parsed,initNs=dict(self.graph.namespaces()))
+
+    @contextmanager
+    def _select_many_executor(self, workers):
+        # rdflib evaluates queries in pure Python,  so local queries only run in parallel in separate processes,
+        # each of which gets its own copy of the endpoint and its graph when it starts
+        from concurrent.futures import ProcessPoolExecutor
+        with self._workers_lock:
+            if self._workers is not None and self._workers[0]!=workers:
+                self._workers[1].shutdown(wait=False)
+                self._workers=None
+            if self._workers is None:
+                executor=ProcessPoolExecutor(max_workers=workers,initializer=_start_select_worker,initargs=(self,))
+                self._workers=(workers,executor)
+            executor=self._workers[1]
+        yield (executor,_select_in_worker)
+
+    def _construct(self, sparql:str,graph=None,**kwargs) -> Graph:
+        result=self._query(sparql,**kwargs)
+        if graph is None:
+            return result
+        target=_target_graph(graph)
+        target.addN((s,p,o,target) for (s,p,o) in result)
+        return target
 
     def _update(self, sparql:str,**kwargs) ->None :
         self.graph.update(sparql)
         return
 
+    def _insert_triples(self,triples,graph,**kwargs) -> int:
+        if graph is None:
+            target=self.graph
+        elif hasattr(self.graph,"get_context"):
+            target=self.graph.get_context(self._as_uri(graph))
+        else:
+            raise ValueError("Can only insert into a named graph if the graph of this endpoint is a Dataset")
+        quads=[(s,p,o,target) for (s,p,o) in triples]
+        target.addN(quads)
+        return len(quads)
+
+class ArrayStore(Store):
+    '''
+        In-memory rdflib `Store` built for large graphs that are loaded once and then queried,  for use as
+        ``LocalEndpoint(Graph(store=ArrayStore()))``.
+
+        Each distinct term is stored once and given an integer id,  and the triples are kept as arrays of ids sorted
+        three ways (subject-predicate-object,  predicate-object-subject and object-subject-predicate),  so that any
+        triple pattern is a binary search for a contiguous range.  This takes about 70 bytes a triple plus the terms
+        themselves,  against several hundred for the default rdflib store.  SPARQL queries go through rdflib as usual,
+        except that when a :class:`LocalEndpoint` runs them each basic graph pattern is matched as a whole:  its
+        triple patterns are looked up in the indexes and joined with numpy,  rather than one solution at a time.
+
+        Added triples are collected and sorted into the indexes the next time the store is read,  so adding triples
+        one by one between queries is slow,  as is removing them,  which rewrites the indexes.  Terms are not
+        forgotten when the last triple using them is removed.  The store has no named graphs and sends no events.
+
+        :param configuration: ignored,  accepted as for other rdflib stores
+        :param identifier: identifier of the store
+    '''
+    context_aware=False
+    formula_aware=False
+    transaction_aware=False
+    graph_aware=False
+
+    def __init__(self,configuration=None,identifier=None):
+        super().__init__(configuration,identifier)
+        self.identifier=identifier
+        self._ids={}
+        self._terms=[]
+        self._term_array=np.empty(0,dtype=object)
+        self._pending=array("q")
+        empty=np.empty(0,dtype=np.int32)
+        self._indexes=[(positions,(empty,empty,empty)) for positions in _array_orders]
+        self._namespace={}
+        self._prefix={}
+        self._lock=threading.RLock()
+
+    def __getstate__(self):
+        with self._lock:
+            self._flush()
+            state=self.__dict__.copy()
+        del state["_lock"]
+        del state["_term_array"]
+        del state["_pending"]
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self._lock=threading.RLock()
+        self._term_array=np.empty(0,dtype=object)
+        self._pending=array("q")
+
+    def add(self,triple,context=None,quoted=False):
+        with self._lock:
+            self._pending.extend([self._intern(x) for x in triple])
+
+    def addN(self,quads):
+        with self._lock:
+            for (s,p,o,_) in quads:
+                self._pending.extend([self._intern(s),self._intern(p),self._intern(o)])
+
+    def remove(self,triple,context=None):
+        with self._lock:
+            bound=self._bound(triple)
+            if bound is None:
+                return
+            self._flush()
+            indexes=[]
+            for (positions,columns) in self._indexes:
+                # a triple goes if it matches every bound position;  a pattern with none bound matches them all
+                matched=[column==bound[position] for (column,position) in zip(columns,positions) if position in bound]
+                if matched:
+                    keep=~np.logical_and.reduce(matched)
+                else:
+                    keep=np.zeros(len(columns[0]),dtype=bool)
+                indexes.append((positions,tuple(x[keep] for x in columns)))
+            self._indexes=indexes
+
+    def triples(self,triple_pattern,context=None):
+        bound=self._bound(triple_pattern)
+        if bound is None:
+            return
+        (columns,terms)=self._scan(bound)
+        # terms are made a block at a time,  so scanning a large graph does not build all of them at once
+        for start in range(0,len(columns[0]),10000):
+            for triple in zip(*(terms[x[start:start+10000]] for x in columns)):
+                yield (triple,iter(()))
+
+    def __len__(self,context=None):
+        with self._lock:
+            self._flush()
+            return len(self._indexes[0][1][0])
+
+    def contexts(self,triple=None):
+        return iter(())
+
+    def bind(self,prefix,namespace,override=True):
+        bound_namespace=self._namespace.get(prefix)
+        bound_prefix=self._prefix.get(namespace)
+        if bound_prefix is None:
+            bound_prefix=self._prefix.get(bound_namespace)
+        if override:
+            if bound_prefix is not None:
+                del self._namespace[bound_prefix]
+            if bound_namespace is not None:
+                del self._prefix[bound_namespace]
+            self._prefix[namespace]=prefix
+            self._namespace[prefix]=namespace
+        else:
+            namespace=namespace if bound_namespace is None else bound_namespace
+            prefix=prefix if bound_prefix is None else bound_prefix
+            self._prefix[namespace]=prefix
+            self._namespace[prefix]=namespace
+
+    def namespace(self,prefix):
+        return self._namespace.get(prefix)
+
+    def prefix(self,namespace):
+        return self._prefix.get(namespace)
+
+    def namespaces(self):
+        return iter(list(self._namespace.items()))
+
+    def _intern(self,term) -> int:
+        code=self._ids.get(term)
+        if code is None:
+            code=self._ids[term]=len(self._terms)
+            self._terms.append(term)
+        return code
+
+    def _bound(self,triple):
+        '''
+        :param triple: triple pattern,  with None for the positions that match anything
+        :return: dict mapping the bound positions to term ids,  or None if a term is not in the store,  so that
+            nothing can match
+        '''
+        bound={}
+        for (position,term) in enumerate(triple):
+            if term is not None:
+                code=self._ids.get(term)
+                if code is None:
+                    return None
+                bound[position]=code
+        return bound
+
+    def _flush(self):
+        # merge the triples added since the last read into the indexes,  dropping duplicates
+        if not self._pending:
+            return
+        added=np.frombuffer(self._pending,dtype=np.int64).reshape(-1,3)
+        (_,(s,p,o))=self._indexes[0]
+        rows=np.concatenate([np.column_stack([s,p,o]),added]).astype(np.int32 if len(self._terms)<2**31 else np.int64)
+        self._pending=array("q")
+        rows=rows[np.lexsort((rows[:,2],rows[:,1],rows[:,0]))]
+        if len(rows)>1:
+            rows=rows[np.concatenate([[True],(rows[1:]!=rows[:-1]).any(axis=1)])]
+        indexes=[]
+        for positions in _array_orders:
+            order=np.lexsort(tuple(rows[:,x] for x in reversed(positions)))
+            indexes.append((positions,tuple(np.ascontiguousarray(rows[order,x]) for x in positions)))
+        self._indexes=indexes
+
+    def _scan(self,bound:Dict):
+        '''
+        :param bound: dict mapping the bound positions of a triple pattern to term ids
+        :return: (columns,  terms) where columns are arrays of the subject,  predicate and object ids of the
+            matching triples and terms is an object array mapping ids to terms
+        '''
+        with self._lock:
+            self._flush()
+            if len(self._term_array)!=len(self._terms):
+                self._term_array=np.empty(len(self._terms),dtype=object)
+                self._term_array[:]=self._terms
+            terms=self._term_array
+            for (positions,columns) in self._indexes:
+                if set(positions[:len(bound)])==set(bound):
+                    break
+        (low,high)=(0,len(columns[0]))
+        for (column,position) in zip(columns,positions[:len(bound)]):
+            within=column[low:high]
+            (low,high)=(low+np.searchsorted(within,bound[position],"left"),
+                        low+np.searchsorted(within,bound[position],"right"))
+        found=[None]*3
+        for (column,position) in zip(columns,positions):
+            found[position]=column[low:high]
+        return (found,terms)
+
+    def _match_bgp(self,ctx,triples):
+        '''
+        Match a basic graph pattern by looking up each triple pattern in the indexes and joining the results with
+        numpy,  starting with the pattern that matches the fewest triples and going on to the smallest one that
+        shares a variable with those already joined.
+
+        :param ctx: rdflib QueryContext,  whose bindings are substituted into the patterns
+        :param triples: triple patterns of the BGP
+        :return: iterator of rdflib FrozenBindings,  one for each solution
+        '''
+        from rdflib.plugins.sparql.sparql import FrozenBindings
+        if not triples:
+            return iter([ctx.solution()])
+        scans=[]
+        for triple in triples:
+            pattern=[ctx[x] for x in triple]
+            bound=self._bound(pattern)
+            if bound is None:
+                return iter(())
+            (columns,terms)=self._scan(bound)
+            table={}
+            for (position,term) in enumerate(pattern):
+                if term is None:
+                    variable=triple[position]
+                    if variable in table:
+                        # the same variable twice in one pattern,  as in ?x ex:knows ?x
+                        keep=table[variable]==columns[position]
+                        table={name:column[keep] for (name,column) in table.items()}
+                        columns=[x[keep] for x in columns]
+                    else:
+                        table[variable]=columns[position]
+            scans.append((len(columns[0]),table))
+
+        solutions={}
+        size=1
+        while scans:
+            connected=[x for x in scans if solutions.keys() & x[1].keys()]
+            scan=min(connected or scans,key=lambda x:x[0])
+            scans.remove(scan)
+            (solutions,size)=_join_solutions(solutions,size,scan[1],scan[0])
+            if not size:
+                return iter(())
+
+        base=dict(ctx.solution())
+        names=list(solutions)
+        columns=[terms[solutions[x]] for x in names]
+        if not names:
+            return iter([FrozenBindings(ctx,base)]*size)
+        return (FrozenBindings(ctx,{**base,**dict(zip(names,row))}) for row in zip(*columns))
+
+# the sort orders of the indexes kept by ArrayStore,  as positions in the triple;  every set of bound positions is
+# a prefix of one of them
+_array_orders=((0,1,2),(1,2,0),(2,0,1))
+
+_array_lock=threading.Lock()
+_array_users=0
+
+class _ArrayEvaluation:
+    # rdflib calls every custom evaluation function for every part of every query,  so _array_part is only
+    # registered while a query over an ArrayStore runs
+    def __enter__(self):
+        from rdflib.plugins.sparql import CUSTOM_EVALS
+        global _array_users
+        with _array_lock:
+            _array_users+=1
+            CUSTOM_EVALS["gastrodon_arrays"]=_array_part
+        return self
+
+    def __exit__(self,kind,value,traceback):
+        from rdflib.plugins.sparql import CUSTOM_EVALS
+        global _array_users
+        with _array_lock:
+            _array_users-=1
+            if not _array_users:
+                del CUSTOM_EVALS["gastrodon_arrays"]
+        return False
+
+def _array_part(ctx,part):
+    # rdflib hands every part of a query here first,  including queries run on other threads at the same time;
+    # only the BGPs over an ArrayStore are taken
+    if part.name!="BGP" or not isinstance(getattr(ctx.graph,"store",None),ArrayStore):
+        raise NotImplementedError()
+    if any(not isinstance(x,(URIRef,Literal,BNode,Variable)) for triple in part.triples for x in triple):
+        # property paths are left to rdflib
+        raise NotImplementedError()
+    profiler=getattr(_profile_state,"profiler",None)
+    if profiler is not None and id(part) not in profiler.timing:
+        # let the profiler start its clock first
+        raise NotImplementedError()
+    return ctx.graph.store._match_bgp(ctx,part.triples)
+
+def _join_solutions(left:Dict,left_size:int,right:Dict,right_size:int):
+    '''
+    Join two tables of solutions,  each a dict mapping variables to equal-length arrays of term ids,  on the
+    variables they share,  by sorting the right side and finding the run of matches for each row of the left.
+
+    :return: (table,  number of rows) of the joined solutions
+    '''
+    shared=[x for x in left if x in right]
+    if not shared:
+        left_rows=np.repeat(np.arange(left_size),right_size)
+        right_rows=np.tile(np.arange(right_size),left_size)
+    else:
+        (left_key,right_key)=(left[shared[0]].astype(np.int64),right[shared[0]].astype(np.int64))
+        for name in shared[1:]:
+            # pairs of keys are renumbered so that the combined key stays within 64 bits
+            ids=np.concatenate([left[name],right[name]]).astype(np.int64)
+            combined=np.concatenate([left_key,right_key])*(int(ids.max())+1)+ids
+            codes=np.unique(combined,return_inverse=True)[1].reshape(-1)
+            (left_key,right_key)=(codes[:left_size],codes[left_size:])
+        order=np.argsort(right_key,kind="stable")
+        ordered=right_key[order]
+        low=np.searchsorted(ordered,left_key,"left")
+        counts=np.searchsorted(ordered,left_key,"right")-low
+        left_rows=np.repeat(np.arange(left_size),counts)
+        total=len(left_rows)
+        offsets=np.arange(total)-np.repeat(np.cumsum(counts)-counts,counts)
+        right_rows=order[np.repeat(low,counts)+offsets]
+
+    table={name:column[left_rows] for (name,column) in left.items()}
+    for (name,column) in right.items():
+        if name not in table:
+            table[name]=column[right_rows]
+    return (table,len(left_rows))
+
+#
+# query profiling for LocalEndpoint:  while a profile runs,  a custom evaluation function sees every part of the
+# query algebra rdflib evaluates,  hands it back to rdflib and counts the solutions that come out
+#
+
+_plan_operators={
+    "BGP","Filter","Join","LeftJoin","Graph","Union","ToMultiSet","Extend","Minus","Project","Slice","Distinct",
+    "Reduced","OrderBy","Group","AggregateJoin","SelectQuery","AskQuery","ConstructQuery","DescribeQuery",
+    "ServiceGraphPattern"
+}
+
+_profile_state=threading.local()
+_profile_lock=threading.Lock()
+_profile_users=0
+
+class _OperatorCounts:
+    __slots__=("calls","rows","seconds")
+
+    def __init__(self):
+        self.calls=0
+        self.rows=0
+        self.seconds=0.0
+
+class _Profiler:
+    def __init__(self):
+        self.counts={}
+        self.passing=None
+        self.timing=set()
+
+    def __enter__(self):
+        from rdflib.plugins.sparql import CUSTOM_EVALS
+        global _profile_users
+        with _profile_lock:
+            _profile_users+=1
+            CUSTOM_EVALS["gastrodon_profile"]=_profile_part
+        _profile_state.profiler=self
+        return self
+
+    def __exit__(self,kind,value,traceback):
+        from rdflib.plugins.sparql import CUSTOM_EVALS
+        global _profile_users
+        _profile_state.profiler=None
+        with _profile_lock:
+            _profile_users-=1
+            if not _profile_users:
+                del CUSTOM_EVALS["gastrodon_profile"]
+        return False
+
+def _profile_part(ctx,part):
+    profiler=getattr(_profile_state,"profiler",None)
+    if profiler is None or part is profiler.passing:
+        # not profiling on this thread,  or the part has come back to be evaluated by rdflib itself
+        if profiler is not None:
+            profiler.passing=None
+        raise NotImplementedError()
+
+    from rdflib.plugins.sparql.evaluate import evalPart
+    counts=profiler.counts.setdefault(id(part),_OperatorCounts())
+    counts.calls+=1
+    start=time.perf_counter()
+    profiler.passing=part
+    profiler.timing.add(id(part))
+    try:
+        result=evalPart(ctx,part)
+    finally:
+        profiler.passing=None
+        profiler.timing.discard(id(part))
+        counts.seconds+=time.perf_counter()-start
+    if isinstance(result,dict):
+        return result
+    return _counted(result,counts)
+
+def _counted(solutions,counts:_OperatorCounts):
+    iterator=iter(solutions)
+    while True:
+        start=time.perf_counter()
+        try:
+            solution=next(iterator)
+        except StopIteration:
+            counts.seconds+=time.perf_counter()-start
+            return
+        counts.seconds+=time.perf_counter()-start
+        counts.rows+=1
+        yield solution
+
+def _plan_children(value):
+    #
+    # the operators directly below a part of the query algebra,  including those inside expressions,  such as the
+    # pattern of a FILTER EXISTS
+    #
+    from rdflib.plugins.sparql.parserutils import CompValue
+    if isinstance(value,CompValue):
+        nested=list(value.values())+[x for (k,x) in value.__dict__.items() if k not in ("name","_evalfn","ctx")]
+    elif isinstance(value,(list,tuple)):
+        nested=value
+    else:
+        return []
+
+    children=[]
+    for x in nested:
+        if isinstance(x,CompValue) and x.name in _plan_operators:
+            children.append(x)
+        else:
+            children.extend(_plan_children(x))
+    return children
+
+def _plan_detail(part:CompValue,names) -> str:
+    n3=lambda x: x.n3(names) if names is not None and not isinstance(x,Variable) else x.n3()
+    if part.name=="BGP":
+        return " . ".join(" ".join(n3(x) for x in triple) for triple in part.triples)
+    if part.name=="Project":
+        return " ".join(x.n3() for x in part.PV)
+    if part.name=="Extend":
+        return part.var.n3()
+    if part.name=="Slice":
+        return "offset %s limit %s" % (part.start,part.length)
+    if part.name=="Graph":
+        return n3(part.term)
+    return ""
+
+def _plan_rows(root:CompValue,names,counts=None,depth=0,rows=None):
+    if rows is None:
+        rows=[]
+    row=dict(depth=depth,operator=root.name,detail=_plan_detail(root,names))
+    rows.append(row)
+    below=0.0
+    for child in _plan_children(root):
+        _plan_rows(child,names,counts,depth+1,rows)
+        seen=None if counts is None else counts.get(id(child))
+        below+=seen.seconds if seen else 0.0
+    if counts is not None:
+        seen=counts.get(id(root))
+        row["calls"]=seen.calls if seen else 0
+        row["rows"]=seen.rows if seen else 0
+        row["time"]=seen.seconds if seen else 0.0
+        row["self_time"]=max(row["time"]-below,0.0)
+    return rows
+
+#
+# serial numbers that tell endpoints and graphs apart in cache keys;  unlike id() they are never reused
+#
+
+_serials=count()
+_graph_serials={}
+_graph_serials_lock=threading.Lock()
+
+def _graph_serial(graph):
+    # a graph gets its number the first time it is seen,  and the number is forgotten when the graph is freed
+    with _graph_serials_lock:
+        entry=_graph_serials.get(id(graph))
+        if entry is None or entry[0]() is not graph:
+            entry=(weakref.ref(graph),next(_serials))
+            _graph_serials[id(graph)]=entry
+            weakref.finalize(graph,_graph_serials.pop,id(graph),None)
+        return entry[1]
+
+#
+# instrumentation:  the timing of the query running on each thread,  if its endpoint has listeners
+#
+
+_timing_state=threading.local()
+
+_untimed=nullcontext()
+
+class _TimingScope:
+    def __init__(self,endpoint:Endpoint,operation:str):
+        self.endpoint=endpoint
+        self.operation=operation
+        self.timing=None
+
+    def __enter__(self):
+        current=getattr(_timing_state,"current",None)
+        if current is not None:
+            # part of a query that is already being timed
+            return current
+        self.timing=QueryTiming(self.operation.lstrip("_"))
+        _timing_state.current=self.timing
+        return self.timing
+
+    def __exit__(self,kind,value,traceback):
+        if self.timing is not None:
+            _timing_state.current=None
+            self.timing._finish(value)
+            self.endpoint._notify(self.timing)
+        return False
+
+class _PhaseScope:
+    def __init__(self,timing:QueryTiming,phase:str):
+        self.timing=timing
+        self.phase=phase
+
+    def __enter__(self):
+        self.timing._enter(self.phase)
+
+    def __exit__(self,kind,value,traceback):
+        self.timing._exit()
+        return False
+
+def _result_rows(result):
+    if isinstance(result,(pd.DataFrame,Graph,Result)):
+        return len(result)
+    return getattr(result,"num_rows",None)
+
+def _share(result):
+    '''
+    Hand out a cached result;  DataFrames are copied so that callers can modify them (eg. with set_index)
+    without touching the cached one.
+    '''
+    if isinstance(result,pd.DataFrame):
+        return result.copy()
+    return result
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value).encode("utf-8")).hexdigest()
+
+def _discard(path:str) -> bool:
+    '''
+    Delete a file that another process may have deleted already,  or (on Windows) still have open
+
+    :return: true if the file was deleted
+    '''
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+_select_worker=None
+
+def _start_select_worker(endpoint:"LocalEndpoint"):
+    global _select_worker
+    _select_worker=endpoint
+
+def _select_in_worker(sparql,**kwargs):
+    return _select_worker._run_select_frame(sparql,**kwargs)
+
+# container membership properties are rdf:_1,  rdf:_2 and so forth
+_member_prefix="http://www.w3.org/1999/02/22-rdf-syntax-ns#_"
+
+# the type and the members of containers,  which is filled in with the variables to select and a VALUES clause
+_decollect_query="""
+    SELECT %%s {
+        %%s
+        ?s ?predicate ?item
+        FILTER(STRSTARTS(STR(?predicate),"%s") || ?predicate=%s && ?item IN (%s))
+    }
+""" % (_member_prefix,RDF.type.n3(),",".join(x.n3() for x in (RDF.Seq,RDF.Bag,RDF.Alt)))
+(_predicate,_item)=(Variable("predicate"),Variable("item"))
+
 def _toRDF(x):
     lex,datatype=_castPythonToLiteral(x, None)
     return Literal(lex,datatype=datatype)
 
+def _term_key(term):
+    '''
+    Classify an rdflib term by the parts of it that determine how it converts to Python
+
+    :param term: rdflib term or None
+    :return: tuple of (kind, datatype, language) or None for an unbound value
+    '''
+    if term is None:
+        return None
+    if isinstance(term, URIRef):
+        return ("uri",None,None)
+    if isinstance(term, BNode):
+        return ("bnode",None,None)
+    return ("literal",term.datatype and str(term.datatype),term.language)
+
+_json_unbound={"type":None,"value":None}
+
+def _term_columns(variables,rows):
+    '''
+    :param variables: variables of a SELECT result
+    :param rows: list of dicts mapping variables to rdflib terms
+    :return: iterator of (name, keys, lexical forms) for each column,  as taken by
+        :meth:`Endpoint._convert_column`
+    '''
+    for variable in variables:
+        terms = [bindings.get(variable) for bindings in rows]
+        yield (
+            str(variable),
+            [_term_key(x) for x in terms],
+            [None if x is None else str(x) for x in terms]
+        )
+
+def _json_columns(variables,rows):
+    '''
+    Cells go straight from the JSON bindings into columns of lexical forms,  classified by their raw
+    (type, datatype, language),  without making rdflib terms
+
+    :param variables: names of the variables of a SPARQL JSON result
+    :param rows: its list of bindings
+    :return: iterator of (name, keys, lexical forms) for each column
+    '''
+    for variable in variables:
+        cells = [x.get(variable,_json_unbound) for x in rows]
+        kinds = [(x["type"],x.get("datatype"),x.get("xml:lang")) for x in cells]
+        key_of = {kind:_json_key(*kind) for kind in set(kinds)}
+        values = [x["value"] for x in cells]
+        if any(key is None and kind[0] is not None for (kind,key) in key_of.items()):
+            # terms of unknown type are left out,  as by _jsonToNode
+            values = [None if key_of[kind] is None else value for (kind,value) in zip(kinds,values)]
+        if len(key_of)==1:
+            keys = [key_of[kinds[0]]]*len(kinds)
+        else:
+            keys = [key_of[x] for x in kinds]
+        yield (variable,keys,values)
+
+def _tsv_columns(table:pd.DataFrame):
+    '''
+    :param table: SPARQL TSV result as read by :func:`_read_table`
+    :return: iterator of (name, keys, lexical forms) for each column
+    '''
+    for name in table.columns:
+        (codes,uniques) = pd.factorize(table[name])
+        terms = [_tsv_term(x) for x in uniques]
+        yield (
+            name.lstrip("?$"),
+            [None if x<0 else terms[x][0] for x in codes],
+            [None if x<0 else terms[x][1] for x in codes]
+        )
+
+def _arrow_table(columns):
+    '''
+    :param columns: iterator of (name, keys, lexical forms) for each column of a SELECT result
+    :return: :class:`pyarrow.Table`
+    '''
+    import pyarrow
+    names = []
+    arrays = []
+    for (name,keys,values) in columns:
+        names.append(name)
+        arrays.append(_arrow_column(keys,values))
+    return pyarrow.Table.from_arrays(arrays,names=names)
+
+def _arrow_column(keys,values):
+    '''
+    Build an Arrow array from the lexical forms of a result column,  letting Arrow parse typed literals
+
+    :param keys: term key (kind, datatype, language) of each cell,  None where unbound
+    :param values: lexical form of each cell,  None where unbound
+    :return: :class:`pyarrow.Array`
+    '''
+    import pyarrow
+    import pyarrow.compute
+    strings = pyarrow.array(values,type=pyarrow.string())
+    present = set(keys)
+    present.discard(None)
+    kinds = {(kind,bool(language)) for (kind,datatype,language) in present}
+    if kinds in ({("uri",False)},{("bnode",False)},{("literal",True)}):
+        return strings.dictionary_encode()
+
+    if len(present)==1:
+        (kind,datatype,language) = next(iter(present))
+        for arrow_type in _arrow_types(datatype,values):
+            try:
+                return pyarrow.compute.cast(strings,arrow_type)
+            except (pyarrow.ArrowInvalid,pyarrow.ArrowNotImplementedError):
+                pass
+    return strings
+
+def _arrow_types(datatype,values):
+    '''
+    :param datatype: XSD datatype shared by the cells of a column
+    :param values: their lexical forms
+    :return: list of Arrow types to try parsing the column as,  in order
+    '''
+    import pyarrow
+    if datatype in _xsd_numeric_types:
+        return [pyarrow.int64() if _xsd_numeric_types[datatype]==np.int64 else pyarrow.float64()]
+    if datatype==_xsd+"decimal":
+        scale=max((len(x.partition(".")[2]) for x in values if x is not None),default=0)
+        return [pyarrow.decimal128(38,scale)] if scale<=18 else [pyarrow.float64()]
+    if datatype==_xsd+"boolean":
+        return [pyarrow.bool_()]
+    if datatype==_xsd+"date":
+        return [pyarrow.date32()]
+    if datatype==_xsd+"dateTime":
+        return [pyarrow.timestamp("us"),pyarrow.timestamp("us",tz="UTC")]
+    return []
+
+def _json_key(type,datatype=None,language=None):
+    '''
+    Classify a term from a SPARQL JSON result the same way :meth:`RemoteEndpoint._jsonToNode` would build it
+
+    :param type: "type" of the term in the JSON result
+    :param datatype: its "datatype",  if any
+    :param language: its "xml:lang",  if any
+    :return: tuple of (kind, datatype, language) or None
+    '''
+    if type == "uri":
+        return ("uri",None,None)
+    if type == "typed-literal":
+        return ("literal",datatype,None)
+    if type == "literal":
+        return ("literal",datatype,language)
+    if type == "bnode":
+        return ("bnode",None,None)
+    return None
+
+# the Accept header sent for each result format;  the names of the formats are also the return formats SPARQLWrapper
+# takes for them
+_result_formats={
+    "json":"application/sparql-results+json,application/json;q=0.9,application/sparql-results+xml;q=0.5",
+    "tsv":"text/tab-separated-values,application/sparql-results+json;q=0.8,application/sparql-results+xml;q=0.5",
+    "csv":"text/csv,application/sparql-results+json;q=0.8,application/sparql-results+xml;q=0.5",
+    "xml":"application/sparql-results+xml,application/sparql-results+json;q=0.8"
+}
+
+_content_formats={
+    "text/tab-separated-values":"tsv",
+    "text/csv":"csv",
+    "application/sparql-results+xml":"xml",
+    "application/xml":"xml",
+    "text/xml":"xml",
+    "application/sparql-results+json":"json",
+    "application/json":"json",
+    "text/javascript":"json",
+    "application/javascript":"json"
+}
+
+_graph_accept="application/n-triples,text/plain;q=0.9,text/turtle;q=0.8,application/rdf+xml;q=0.5"
+
+_graph_formats={
+    "application/n-triples":"nt",
+    "text/plain":"nt",
+    "text/turtle":"turtle",
+    "application/turtle":"turtle",
+    "application/x-turtle":"turtle",
+    "text/n3":"n3",
+    "text/rdf+n3":"n3",
+    "application/rdf+xml":"xml",
+    "application/ld+json":"json-ld"
+}
+
+def _graph_format(response) -> str:
+    '''
+    :param response: HTTP response to a CONSTRUCT or DESCRIBE query
+    :return: rdflib name of the format the graph is written in,  going by its Content-Type
+    '''
+    content_type=response.info().get("Content-Type") or ""
+    # N-Triples is a subset of Turtle,  so Turtle is the safe guess
+    return _graph_formats.get(content_type.split(";")[0].strip().lower(),"turtle")
+
+def _target_graph(graph) -> Graph:
+    if graph is None:
+        return Graph()
+    if isinstance(graph,Store):
+        return Graph(store=graph)
+    return graph
+
+class _BatchSink:
+    """
+        Receives triples from the rdflib N-Triples parser and adds them to a graph with `addN`,  `batch_size` at a
+        time,  rather than one by one.
+
+        :param graph: Graph to add the triples to
+        :param batch_size: number of triples to add at once
+    """
+    def __init__(self,graph:Graph,batch_size=10000):
+        self.graph=graph
+        self.batch_size=batch_size
+        self.batch=[]
+
+    def triple(self,s,p,o):
+        self.batch.append((s,p,o,self.graph))
+        if len(self.batch)>=self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.graph.addN(self.batch)
+            self.batch=[]
+
+def _parse_ntriples(stream,graph:Graph,batch_size=10000):
+    '''
+    :param stream: binary file-like object holding N-Triples,  which are read a block at a time
+    :param graph: Graph to add the triples to,  in batches
+    :param batch_size: number of triples in each batch
+    '''
+    from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+    sink = _BatchSink(graph,batch_size)
+    W3CNTriplesParser(sink).parse(stream)
+    sink.flush()
+
+def _read_ntriples(path:str,graph:Graph) -> Graph:
+    '''
+    :param path: N-Triples file kept by a :class:`DiskCache`
+    :param graph: Graph to add its triples to
+    :return: the graph
+    '''
+    with open(path,"rb") as file:
+        if os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as view:
+                # the triples are added once the whole file has parsed,  so a damaged file leaves the graph alone
+                _parse_ntriples(view,graph,math.inf)
+    return graph
+
+def _write_columns(file,columns):
+    '''
+    Write a SELECT result to Parquet as the lexical form of each value and a code for its term key,  with the
+    list of keys in the metadata,  so that it can be converted again when it is read back.  Each column is stored
+    under the name of its variable and its codes next to it,  under the name followed by "#key".
+
+    :param file: binary file to write to
+    :param columns: list of (name, keys, lexical forms) for each column,  or the DataFrame of a CSV result
+    '''
+    import pyarrow
+    import pyarrow.parquet
+    if isinstance(columns,pd.DataFrame):
+        table=pyarrow.Table.from_pandas(columns,preserve_index=False)
+    else:
+        codes={}
+        names=[]
+        arrays=[]
+        for (name,keys,values) in columns:
+            names+=[name,name+"#key"]
+            arrays.append(pyarrow.array(values,type=pyarrow.string()))
+            arrays.append(pyarrow.array([None if x is None else codes.setdefault(x,len(codes)) for x in keys],
+                                        type=pyarrow.int32()))
+        metadata={"gastrodon.keys":json.dumps(list(codes))}
+        table=pyarrow.Table.from_arrays(arrays,names=names,metadata=metadata)
+    pyarrow.parquet.write_table(table,file)
+
+def _read_columns(path:str):
+    '''
+    :param path: Parquet file written by :func:`_write_columns`,  which is memory mapped
+    :return: list of (name, keys, lexical forms) for each column,  or a DataFrame for a CSV result
+    '''
+    import pyarrow.parquet
+    table=pyarrow.parquet.read_table(path,memory_map=True)
+    metadata=table.schema.metadata or {}
+    if b"gastrodon.keys" not in metadata:
+        return table.to_pandas()
+    keys=[tuple(x) for x in json.loads(metadata[b"gastrodon.keys"])]
+    columns=[]
+    for index in range(0,table.num_columns,2):
+        codes=table.column(index+1).to_pylist()
+        columns.append((table.column_names[index],[None if x is None else keys[x] for x in codes],
+                        table.column(index).to_pylist()))
+    return columns
+
+def _insert_batches(triples,head:str,tail:str,batch_bytes:int):
+    '''
+    :param triples: iterable of (s,p,o) rdflib terms
+    :param head: text that opens an update,  such as "INSERT DATA {"
+    :param tail: text that closes it
+    :param batch_bytes: size past which a new update is started
+    :return: iterator of (update text, number of triples in it)
+    '''
+    lines=[]
+    size=0
+    for (s,p,o) in triples:
+        line="%s %s %s .\n" % (s.n3(),p.n3(),o.n3())
+        if lines and size+len(line)>batch_bytes:
+            yield (head+"".join(lines)+tail,len(lines))
+            lines=[]
+            size=0
+        lines.append(line)
+        size+=len(line)
+    if lines:
+        yield (head+"".join(lines)+tail,len(lines))
+
+def _response_format(response,requested:str) -> str:
+    '''
+    :param response: HTTP response to a query
+    :param requested: result format that was asked for
+    :return: result format the endpoint answered in,  going by its Content-Type
+    '''
+    content_type=response.info().get("Content-Type") or ""
+    return _content_formats.get(content_type.split(";")[0].strip().lower(),requested)
+
+def _read_table(stream,returned:str,chunk_rows=None):
+    '''
+    Read a SPARQL 1.1 TSV or CSV result with the pandas C parser.  TSV cells are kept as written,  to be decoded
+    by :func:`_tsv_term`;  TSV escapes tabs and line breaks inside literals,  so no quoting is needed.  An empty cell
+    is an unbound value.
+
+    :param stream: binary file-like object holding the result
+    :param returned: "tsv" or "csv"
+    :param chunk_rows: if given,  return an iterator of DataFrames with at most this many rows each
+    :return: DataFrame or iterator of DataFrames
+    '''
+    options=dict(keep_default_na=False,na_values=[""],chunksize=chunk_rows,encoding="utf-8",engine="c")
+    if returned=="tsv":
+        options.update(sep="\t",dtype=object,quoting=csv.QUOTE_NONE)
+    try:
+        return pd.read_csv(stream,**options)
+    except pd.errors.EmptyDataError:
+        empty=pd.DataFrame()
+        return iter([empty]) if chunk_rows else empty
+
+_tsv_literal_regex=re.compile(r'"(.*)"(?:\^\^<(.*)>|@(.*))?$',re.DOTALL)
+_tsv_escape_regex=re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))',re.DOTALL)
+_tsv_escapes={"t":"\t","b":"\b","n":"\n","r":"\r","f":"\f"}
+_tsv_integer_regex=re.compile(r'[+-]?[0-9]+$')
+_tsv_number_starts=set("+-0123456789")
+
+def _unescape_term(text:str) -> str:
+    if "\\" not in text:
+        return text
+    def unescape_one(m:Match):
+        code=m.group(1) or m.group(2)
+        if code:
+            return chr(int(code,16))
+        return _tsv_escapes.get(m.group(3),m.group(3))
+    return _tsv_escape_regex.sub(unescape_one,text)
+
+def _tsv_term(cell:str):
+    '''
+    Decode an RDF term written in a SPARQL TSV result,  classified the same way as :func:`_json_key` classifies a
+    term from a JSON result
+
+    :param cell: the term as written,  in Turtle syntax
+    :return: tuple of the term key (kind, datatype, language) and the lexical form
+    '''
+    if cell.startswith("<"):
+        return (("uri",None,None),_unescape_term(cell[1:-1]))
+    if cell.startswith("_:"):
+        return (("bnode",None,None),cell[2:])
+    if cell.startswith('"'):
+        m=_tsv_literal_regex.match(cell)
+        if m:
+            return (("literal",m.group(2),m.group(3)),_unescape_term(m.group(1)))
+    # numbers and booleans may be written bare,  as in Turtle
+    if cell in ("true","false"):
+        datatype=_xsd+"boolean"
+    elif _tsv_integer_regex.match(cell):
+        datatype=_xsd+"integer"
+    elif "e" in cell or "E" in cell:
+        datatype=_xsd+"double"
+    else:
+        datatype=_xsd+"decimal"
+    return (("literal",datatype,None),cell)
+
+def _spread(converted,codes):
+    '''
+    Spread the values converted from the distinct cells of a column back over its rows
+
+    :param converted: list or numpy array of values,  one for each distinct cell
+    :param codes: for each row,  the position of its cell in `converted`,  or -1 for an unbound cell
+    :return: list or numpy array with one value for each row
+    '''
+    # -1 picks the last entry,  which is appended to hold the value of an unbound cell
+    if isinstance(converted,pd.Series):
+        return _object_column(_spread(converted.tolist(),codes))
+    if isinstance(converted,np.ndarray):
+        return np.append(converted,np.nan)[codes] if (codes<0).any() else converted[codes]
+    table=np.empty(len(converted)+1,dtype=object)
+    table[:-1]=converted
+    table[-1]=None
+    return table[codes].tolist()
+
+def _object_column(values):
+    '''
+    :param values: list of values
+    :return: Pandas Series of object type holding the values themselves,  since Pandas would otherwise turn
+        :class:`GastrodonURI` values into plain strings
+    '''
+    return pd.Series(values,dtype=object)
+
+def _compact_frame(frame:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Store the URI columns of a frame that repeat values as Categoricals of :class:`GastrodonURI` and its string
+    columns as ``string[pyarrow]`` if pyarrow is available
+
+    :param frame: Pandas DataFrame as returned by select
+    :return: the same frame,  changed in place
+    '''
+    for name in frame.columns:
+        column=frame[name]
+        if column.dtype.kind in "biufcmM" or isinstance(column.dtype,pd.CategoricalDtype):
+            continue
+        (codes,uniques)=pd.factorize(column.to_numpy(dtype=object))
+        if not len(uniques):
+            continue
+        if all(isinstance(x,(GastrodonURI,URIRef)) for x in uniques):
+            # object categories keep the GastrodonURI values,  and with them the full URIs;  a column of mostly
+            # distinct URIs is smaller as it is
+            if 2*len(uniques)<=len(column):
+                frame[name]=pd.Categorical.from_codes(codes,categories=pd.Index(uniques,dtype=object))
+        elif all(type(x)==str for x in uniques):
+            try:
+                frame[name]=column.astype(pd.StringDtype("pyarrow"))
+            except ImportError:
+                pass
+    return frame
+
+def _make_term(key,lexical):
+    (kind,datatype,language)=key
+    if kind=="uri":
+        return URIRef(lexical)
+    if kind=="bnode":
+        return BNode(lexical)
+    return Literal(lexical,datatype=datatype,lang=language)
+
+def _parse_numeric_column(values,dtype):
+    '''
+    Parse the lexical forms of a numeric column in one pass.  Unbound cells become NaN,  in which case an integer
+    column is widened to float just as pandas would do for a list of ints and Nones.
+
+    :param values: list of lexical forms,  None for unbound cells
+    :param dtype: numpy type to parse into
+    :return: numpy array
+    '''
+    if None not in values:
+        return np.array(values,dtype=str).astype(dtype)
+
+    bound=np.array([x is not None for x in values])
+    column=np.full(len(values),np.nan)
+    column[bound]=np.array([x for x in values if x is not None],dtype=str).astype(dtype)
+    return column
+
 def ttl(g:Store):
     '''
     Write out Graph (or other Store) in Turtle format to stdout.
@@ -815,6 +3884,7 @@ def ttl(g:Store):
     :param g: input Graph
     :return: nothing
     '''
+    from rdflib.plugins.serializers.turtle import TurtleSerializer
     s = TurtleSerializer(g)
     s.serialize(stdout,spacious=True)
 
@@ -841,6 +3911,7 @@ def show_image(filename):
     :param filename:
     :return: nothing
     '''
+    from IPython.display import display_png
     with open(filename, "rb") as f:
         image = f.read()
         display_png(image, raw=True)
@@ -892,23 +3963,313 @@ def member(index):
     '''
     return URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#_{:d}".format(index+1))
 
-def _extract_decl(parsed: ParseResults,parseFn):
+def _bind_algebra(node,values):
+    '''
+    Put values in place of variables in a SPARQL algebra expression,  the way substituting their text into the query
+    would:  bound variables are also dropped from projections and from the sets of variables each part mentions.
+    Parts of the expression that contain none of the variables are shared with the original,  which is not changed.
+
+    :param node: SPARQL algebra expression
+    :param values: dict mapping Variable to the term that replaces it
+    :return: the expression with values in place
+    '''
+    from pyparsing import ParseResults
+    from rdflib.plugins.sparql.parserutils import CompValue
+    if isinstance(node,Variable):
+        return values.get(node,node)
+    if isinstance(node,CompValue):
+        changed={}
+        for (key,item) in node.items():
+            if key in ("PV","_vars") and item is not None:
+                bound=type(item)(x for x in item if x not in values)
+                if len(bound)!=len(item):
+                    changed[key]=bound
+            else:
+                bound=_bind_algebra(item,values)
+                if bound is not item:
+                    changed[key]=bound
+        # rdflib keeps some parts of the algebra as plain attributes,  such as the translated graph of EXISTS
+        attributes={}
+        for (key,item) in node.__dict__.items():
+            if key not in ("name","_evalfn","ctx"):
+                bound=_bind_algebra(item,values)
+                if bound is not item:
+                    attributes[key]=bound
+        if not changed and not attributes:
+            return node
+        # CompValue (an OrderedDict) cannot be copied with copy(),  but its attributes are all in __dict__;  the
+        # evaluation function of an Expr is a method bound to the node,  so it must be bound to the copy
+        clone=type(node).__new__(type(node))
+        clone.__dict__.update(node.__dict__)
+        clone.__dict__.update(attributes)
+        if getattr(node,"_evalfn",None) is not None:
+            clone._evalfn=MethodType(node._evalfn.__func__,clone)
+        OrderedDict.update(clone,node)
+        OrderedDict.update(clone,changed)
+        return clone
+    if isinstance(node,(list,tuple,ParseResults)):
+        bound=[_bind_algebra(x,values) for x in node]
+        if all(x is y for (x,y) in zip(bound,node)):
+            return node
+        return tuple(bound) if isinstance(node,tuple) else bound
+    return node
+
+# the tokens of a query that can hold braces that are not part of the syntax,  the braces themselves and the WHERE
+# keyword
+_page_token_regex=re.compile("|".join([
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""',
+    r"'''(?:[^'\\]|\\.|'(?!''))*'''",
+    r'"(?:[^"\\\n]|\\.)*"',
+    r"'(?:[^'\\\n]|\\.)*'",
+    r'<[^<>"{}|^`\\\x00-\x20]*>',
+    r'#[^\n]*',
+    r'[{}]',
+    r'(?<![\w?$:])(?i:where)(?![\w:-])'
+]))
+
+def _where_close(sparql:str) -> int:
+    '''
+    :param sparql: text of a SPARQL query
+    :return: position of the brace that closes the WHERE clause
+    '''
+    depth=0
+    for match in _page_token_regex.finditer(sparql):
+        token=match.group()
+        if token=="{":
+            depth+=1
+        elif token=="}":
+            depth-=1
+            if not depth:
+                return match.start()
+    raise ValueError("Could not find the WHERE clause of the query")
+
+def _where_open(sparql:str) -> int:
+    '''
+    :param sparql: text of a SPARQL query or update
+    :return: position just inside the brace that opens the WHERE clause:  the first brace after the WHERE keyword,
+        or the first brace of a query that leaves the keyword out
+    '''
+    depth=0
+    first=None
+    where=False
+    for match in _page_token_regex.finditer(sparql):
+        token=match.group()
+        if token=="{":
+            if not depth:
+                if where:
+                    return match.end()
+                if first is None:
+                    first=match.end()
+            depth+=1
+        elif token=="}":
+            depth-=1
+        elif not depth and token.upper()=="WHERE":
+            where=True
+    if first is None:
+        raise ValueError("Could not find the WHERE clause of the query")
+    return first
+
+def _check_pageable(prepared:"_PreparedQuery",key:str):
+    main=prepared.parsed[1]
+    if main.name!="SelectQuery":
+        raise ValueError("Only SELECT queries can be paged")
+    for (part,words) in [("orderby","ORDER BY"),("limitoffset","LIMIT or OFFSET"),("valuesClause","VALUES")]:
+        if part in main:
+            raise ValueError("Cannot page a query that has its own %s" % words)
+    if prepared.group_by and key not in prepared.group_by:
+        raise ValueError("Cannot page a GROUP BY query by ?%s,  which is not a grouping variable" % key)
+    if key not in prepared.variables:
+        raise ValueError("The query does not mention the key variable ?%s" % key)
+
+# values that are substituted as a VALUES block rather than as a single term
+_values_types=(list,tuple,set,frozenset,np.ndarray,pd.Index,pd.Series,pd.DataFrame)
+
+def _values_batches(bindings:Dict,batch_size=None):
+    '''
+    :param bindings: dict of values to substitute for SPARQL variables
+    :param batch_size: most values to put in the VALUES block of one query,  None to never split
+    :return: list of dicts of values,  one for each query,  which share out the values of the variable with the most
+    '''
+    tables=[name for (name,value) in bindings.items() if isinstance(value,_values_types)]
+    if batch_size is None or not tables:
+        return [bindings]
+
+    name=max(tables,key=lambda x: len(bindings[x]))
+    values=bindings[name]
+    if len(values)<=batch_size:
+        return [bindings]
+    if isinstance(values,(set,frozenset)):
+        values=list(values)
+    part=(lambda start: values.iloc[start:start+batch_size]) if isinstance(values,(pd.Series,pd.DataFrame)) \
+        else (lambda start: values[start:start+batch_size])
+    return [dict(bindings,**{name:part(start)}) for start in range(0,len(values),batch_size)]
+
+def _values_block(name:str,values,serialize):
+    '''
+    :param name: name of the variable the values are bound to
+    :param values: list-like value,  or a DataFrame whose columns bind several variables
+    :param serialize: function that writes a value in SPARQL
+    :return: (names of the variables bound,  text of the VALUES block that binds them)
+    '''
+    if isinstance(values,pd.DataFrame) and len(values.columns)>1:
+        if name[1:] not in values.columns:
+            raise ValueError("A DataFrame bound to ?%s must have a column named %s" % (name,name[1:]))
+        names=["_"+str(x) for x in values.columns]
+        rows=[
+            "(%s)" % " ".join("UNDEF" if _is_missing(x) else serialize(_plain(x)) for x in row)
+            for row in values.itertuples(index=False,name=None)
+        ]
+        return (names,_values_text("(%s)" % " ".join("?"+x for x in names),rows))
+
+    if isinstance(values,pd.DataFrame):
+        values=values.iloc[:,0]
+    # a missing value would be UNDEF,  which matches anything,  so it is left out of a list
+    return ([name],_values_text("?"+name,[serialize(_plain(x)) for x in values if not _is_missing(x)]))
+
+def _values_text(variables:str,rows) -> str:
+    if not rows:
+        # rdflib cannot evaluate an empty VALUES block,  nor FILTER(false)
+        return "FILTER(1 = 0)"
+    return "VALUES %s {\n%s\n}" % (variables,"\n".join(rows))
+
+def _plain(value):
+    return value.item() if isinstance(value,np.generic) else value
+
+def _is_missing(value) -> bool:
+    value=_plain(value)
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value,float) and math.isnan(value))
+
+def _add_values(sparql:str,blocks) -> str:
+    '''
+    :param sparql: text of a SPARQL query
+    :param blocks: text of VALUES blocks
+    :return: the query with the blocks at the start of its WHERE clause,  so they bind their variables before the
+        rest of the pattern is matched
+    '''
+    start=_where_open(sparql)
+    return sparql[:start]+"\n"+"\n".join(blocks)+"\n"+sparql[start:]
+
+def _page_query(sparql:str,key:str,after,page_size:int) -> str:
+    '''
+    :param sparql: text of a SPARQL SELECT query
+    :param key: name of the variable to page by
+    :param after: SPARQL expression that filters out earlier pages,  or None for the first page
+    :param page_size: number of rows in a page
+    :return: text of the query that fetches one page
+    '''
+    if after is not None:
+        close=_where_close(sparql)
+        sparql=sparql[:close]+"\nFILTER(%s)\n" % after+sparql[close:]
+    return sparql+"\nORDER BY ?%s LIMIT %d" % (key,page_size)
+
+class _PreparedQuery:
+    """
+        A SPARQL query or update parsed once,  together with the facts Gastrodon needs from the parse:  the prefixes
+        and base it declares,  its GROUP BY variables and the variables that could be substituted.
+
+        :param sparql: text of the query
+        :param update: true if this is an update rather than a query
+    """
+    def __init__(self,sparql:str,update=False):
+        self.sparql=sparql
+        self.update=update
+        from rdflib.plugins.sparql.parser import parseQuery, parseUpdate
+        with _parse_lock:
+            self.parsed=parseUpdate(sparql) if update else parseQuery(sparql)
+        (self.base,namespaces)=_extract_decl(self.parsed,update)
+        self.declared={prefix for (prefix,uri) in namespaces.namespaces()}
+        self.group_by=[] if update else _extract_group_by(self.parsed)
+        self.variables=_compile_template(sparql).names
+
+class _SubstitutionTemplate:
+    """
+        A query split once around its variables,  so that substituting values only looks up the names the query
+        mentions and joins strings,  instead of running a regular expression over the whole text each time.
+
+        The template also remembers how the URIs passed to it are written in SPARQL,  since the same
+        :class:`GastrodonURI` or :class:`QName` values tend to come back query after query.
+
+        :param sparql: text of the query
+    """
+    n3_cache_size=4096
+
+    def __init__(self,sparql:str):
+        self.sparql=sparql
+        self.segments=[]
+        self.slots=[]
+        position=0
+        for match in _var_regex.finditer(sparql):
+            self.segments.append(sparql[position:match.start()])
+            self.slots.append((match.group(1),match.group()))
+            position=match.end()
+        self.segments.append(sparql[position:])
+        self.names=frozenset(name for (name,text) in self.slots)
+        self._n3={}
+
+    def render(self,args:Dict,serialize) -> str:
+        """
+        :param args: dict mapping variable names to values
+        :param serialize: function that writes a value in SPARQL
+        :return: text of the query with the values in args put in place of their variables
+        """
+        if not self.names.intersection(args):
+            return self.sparql
+
+        written={}
+        parts=[self.segments[0]]
+        for ((name,text),segment) in zip(self.slots,self.segments[1:]):
+            if name in args:
+                if name not in written:
+                    written[name]=serialize(args[name])
+                parts.append(written[name])
+            else:
+                parts.append(text)
+            parts.append(segment)
+        return "".join(parts)
+
+    def n3(self,value,prefixes,to_rdf) -> str:
+        """
+        :param value: value to write in SPARQL
+        :param prefixes: namespaces used to expand a :class:`QName`
+        :param to_rdf: function that converts the value to an RDFLib term
+        :return: the value in N3 syntax,  remembered for URIs
+        """
+        if isinstance(value,GastrodonURI):
+            key=(GastrodonURI,value.uri_ref)
+        elif isinstance(value,QName):
+            key=(QName,value.name,prefixes)
+        else:
+            return to_rdf(value,prefixes).n3()
+
+        if key not in self._n3:
+            if len(self._n3)>=self.n3_cache_size:
+                self._n3.clear()
+            self._n3[key]=to_rdf(value,prefixes).n3()
+        return self._n3[key]
+
+@lru_cache(maxsize=1024)
+def _compile_template(sparql:str) -> _SubstitutionTemplate:
+    return _SubstitutionTemplate(sparql)
+
+@lru_cache(maxsize=1024)
+def _prepare(sparql:str,update=False) -> _PreparedQuery:
+    return _PreparedQuery(sparql,update)
+
+def _extract_decl(parsed: ParseResults,update=False):
     ns=Graph()
     base_iri=None
-    for decl in parsed[0] if parseFn==_parseQuery else parsed["prologue"][0]:
+    for decl in parsed["prologue"][0] if update else parsed[0]:
         if 'prefix' in decl:
             ns.bind(decl["prefix"],decl["iri"],override=True)
         elif 'iri' in decl:
             base_iri=decl["iri"]
     return (base_iri,ns)
 
-@lru_cache()
-def _parseUpdate(sparql):
-    return parseUpdate(sparql)
+#
+# the pyparsing grammar used by rdflib is not safe to use from several threads at once
+#
 
-@lru_cache()
-def _parseQuery(sparql):
-    return parseQuery(sparql)
+_parse_lock=threading.Lock()
 
 def _extract_group_by(parsed):
     main_part=parsed[1]
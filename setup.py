@@ -52,7 +52,7 @@ setup(
 
     # What does your project relate to?
     keywords='sparql rdf rdflib pandas visualization',
-    packages=find_packages(exclude=['art','notebooks']),
+    packages=find_packages(exclude=['art','notebooks','benchmarks']),
     install_requires=[
         'rdflib',
         'pyparsing',
@@ -60,6 +60,7 @@ setup(
         'SPARQLWrapper',
         'uritools',
         'pandas',
+        'numpy',
         'ipython-autotime',
         'matplotlib',
         'bs4',
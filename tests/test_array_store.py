@@ -0,0 +1,95 @@
+import pytest
+from rdflib import Graph, URIRef, Literal, Namespace
+
+from gastrodon import LocalEndpoint, ArrayStore
+
+EX=Namespace("http://example.com/")
+
+TRIPLES=[
+    (EX.alice,EX.knows,EX.bob),
+    (EX.alice,EX.knows,EX.carol),
+    (EX.alice,EX.age,Literal(31)),
+    (EX.bob,EX.knows,EX.carol),
+    (EX.bob,EX.age,Literal(42)),
+    (EX.carol,EX.knows,EX.alice)
+]
+
+@pytest.fixture
+def graph():
+    graph=Graph(store=ArrayStore())
+    for triple in TRIPLES:
+        graph.add(triple)
+    return graph
+
+def remaining(graph):
+    return sorted(graph.triples((None,None,None)))
+
+def test_remove_one_triple(graph):
+    graph.remove((EX.alice,EX.knows,EX.bob))
+    assert remaining(graph)==sorted(x for x in TRIPLES if x!=(EX.alice,EX.knows,EX.bob))
+    assert len(graph)==len(TRIPLES)-1
+
+def test_remove_partial_pattern(graph):
+    graph.remove((EX.alice,EX.knows,None))
+    assert remaining(graph)==sorted(x for x in TRIPLES if x[:2]!=(EX.alice,EX.knows))
+
+def test_remove_by_predicate_and_object(graph):
+    graph.remove((None,EX.knows,EX.carol))
+    assert remaining(graph)==sorted(x for x in TRIPLES if x[1:]!=(EX.knows,EX.carol))
+
+def test_remove_everything(graph):
+    graph.remove((None,None,None))
+    assert remaining(graph)==[]
+    assert len(graph)==0
+
+def test_remove_unknown_term(graph):
+    graph.remove((EX.dave,None,None))
+    graph.remove((EX.alice,EX.knows,EX.alice))
+    assert remaining(graph)==sorted(TRIPLES)
+
+def test_remove_then_add(graph):
+    graph.remove((EX.alice,None,None))
+    graph.add((EX.alice,EX.knows,EX.bob))
+    assert remaining(graph)==sorted([x for x in TRIPLES if x[0]!=EX.alice]+[(EX.alice,EX.knows,EX.bob)])
+
+def test_sparql_delete_data(graph):
+    endpoint=LocalEndpoint(graph)
+    endpoint.update("""
+        DELETE DATA { <http://example.com/alice> <http://example.com/knows> <http://example.com/bob> }
+    """)
+    assert remaining(graph)==sorted(x for x in TRIPLES if x!=(EX.alice,EX.knows,EX.bob))
+
+def test_sparql_delete_insert(graph):
+    endpoint=LocalEndpoint(graph)
+    endpoint.update("""
+        DELETE { ?who <http://example.com/age> ?age }
+        INSERT { ?who <http://example.com/age> ?older }
+        WHERE { ?who <http://example.com/age> ?age BIND(?age+1 AS ?older) }
+    """)
+    frame=endpoint.select("""
+        SELECT ?who ?age { ?who <http://example.com/age> ?age } ORDER BY ?who
+    """)
+    assert frame["age"].tolist()==[32,43]
+    assert len(graph)==len(TRIPLES)
+
+def test_sparql_matches_default_store(graph):
+    plain=Graph()
+    for triple in TRIPLES:
+        plain.add(triple)
+    query="""
+        SELECT ?a ?c { ?a <http://example.com/knows> ?b . ?b <http://example.com/knows> ?c }
+    """
+    assert sorted(graph.query(query))==sorted(plain.query(query))
+
+def test_patterns_matched_by_store_only_while_endpoint_queries(graph,monkeypatch):
+    from rdflib.plugins.sparql import CUSTOM_EVALS
+    matched=[]
+    match=ArrayStore._match_bgp
+    monkeypatch.setattr(ArrayStore,"_match_bgp",lambda self,*args: matched.append(args) or match(self,*args))
+    frame=LocalEndpoint(graph).select("""
+        SELECT ?a ?c { ?a <http://example.com/knows> ?b . ?b <http://example.com/knows> ?c }
+    """)
+    assert len(frame)==5
+    assert matched
+    # queries over other stores do not pass through the store's evaluation
+    assert "gastrodon_arrays" not in CUSTOM_EVALS
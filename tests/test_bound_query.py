@@ -0,0 +1,152 @@
+"""
+LocalEndpoint puts the values bound to variables into the translated algebra of a query rather than into its text.
+Each query here is run both ways:  with its variables bound and with the values written into the text,  which is
+what substitution used to do,  and the results must agree.
+"""
+import pytest
+from rdflib import Graph, BNode, Literal, Namespace
+
+from gastrodon import LocalEndpoint
+
+EX=Namespace("http://example.com/")
+
+PEOPLE={
+    "alice":(31,["bob","carol"]),
+    "bob":(42,["carol"]),
+    "carol":(27,["dave"]),
+    "dave":(42,[])
+}
+
+@pytest.fixture(scope="module")
+def endpoint():
+    graph=Graph()
+    graph.bind("ex",EX)
+    for (name,(age,friends)) in PEOPLE.items():
+        graph.add((EX[name],EX.age,Literal(age)))
+        graph.add((EX[name],EX.name,Literal(name.title(),lang="en")))
+        for friend in friends:
+            graph.add((EX[name],EX.knows,EX[friend]))
+    return LocalEndpoint(graph)
+
+QUERIES={
+    "pattern":"""
+        SELECT ?friend { ?person ex:knows ?friend }
+    """,
+    "two patterns":"""
+        SELECT ?friend ?age { ?person ex:knows ?friend . ?friend ex:age ?age }
+    """,
+    "optional":"""
+        SELECT ?friend ?other { ?person ex:knows ?friend OPTIONAL { ?friend ex:knows ?other } }
+    """,
+    "filter":"""
+        SELECT ?who { ?who ex:age ?age FILTER(?age > ?limit) }
+    """,
+    "filter on the bound variable":"""
+        SELECT ?who ?age { ?who ex:age ?age FILTER(?who != ?person) }
+    """,
+    "subquery":"""
+        SELECT ?friend ?count {
+            ?person ex:knows ?friend
+            { SELECT ?friend (COUNT(?next) AS ?count) { ?friend ex:knows ?next } GROUP BY ?friend }
+        }
+    """,
+    "exists":"""
+        SELECT ?who { ?who ex:age ?age FILTER EXISTS { ?person ex:knows ?who } }
+    """,
+    "not exists":"""
+        SELECT ?who { ?who ex:age ?age FILTER NOT EXISTS { ?person ex:knows ?who } }
+    """,
+    "minus":"""
+        SELECT ?who { ?who ex:age ?age MINUS { ?person ex:knows ?who } }
+    """,
+    "union":"""
+        SELECT ?who { { ?person ex:knows ?who } UNION { ?who ex:knows ?person } }
+    """,
+    "group by":"""
+        SELECT ?age (COUNT(?who) AS ?count) { ?who ex:age ?age FILTER(?age >= ?limit) } GROUP BY ?age
+    """,
+    "having":"""
+        SELECT ?age (COUNT(?who) AS ?count) { ?who ex:age ?age } GROUP BY ?age HAVING(COUNT(?who) >= ?limit)
+    """,
+    "aggregate":"""
+        SELECT (COUNT(?friend) AS ?count) (MAX(?age) AS ?oldest) { ?person ex:knows ?friend . ?friend ex:age ?age }
+    """,
+    "path":"""
+        SELECT ?who { ?person ex:knows+ ?who }
+    """,
+    "inverse path":"""
+        SELECT ?who { ?person ^ex:knows ?who }
+    """,
+    "path to a bound object":"""
+        SELECT ?who { ?who ex:knows/ex:knows ?person }
+    """,
+    "bind":"""
+        SELECT ?who ?older { ?who ex:age ?age BIND(?age + ?limit AS ?older) }
+    """,
+    "select star":"""
+        SELECT * { ?person ex:knows ?friend . ?friend ex:age ?age }
+    """,
+    "order by":"""
+        SELECT ?who { ?who ex:age ?age } ORDER BY DESC(?age = ?limit) ?who
+    """,
+    "distinct and limit":"""
+        SELECT DISTINCT ?age { ?who ex:age ?age FILTER(?who != ?person) } ORDER BY ?age LIMIT 2
+    """,
+    "language tagged literal":"""
+        SELECT ?who { ?who ex:name ?label FILTER(?label = ?name) }
+    """,
+    "values":"""
+        SELECT ?who ?age { VALUES ?who { ex:alice ex:bob } ?who ex:age ?age FILTER(?age < ?limit) }
+    """
+}
+
+BINDINGS=dict(person=EX.alice,limit=30,name=Literal("Carol",lang="en"))
+
+def _written(sparql:str,bindings) -> str:
+    for (name,value) in bindings.items():
+        term=Literal(value) if isinstance(value,int) else value
+        sparql=sparql.replace("?"+name,term.n3())
+    return sparql
+
+def _rows(frame):
+    frame=frame.reset_index()
+    return sorted(tuple(str(x) for x in row) for row in frame[sorted(frame.columns)].itertuples(index=False))
+
+@pytest.mark.parametrize("name",list(QUERIES))
+def test_bound_query_matches_written_query(endpoint,name):
+    sparql=QUERIES[name]
+    bindings={x:y for (x,y) in BINDINGS.items() if "?"+x in sparql}
+    assert bindings
+    bound=endpoint.select(sparql,bindings=bindings)
+    written=endpoint.select(_written(sparql,bindings))
+    assert sorted(bound.columns)==sorted(written.columns)
+    assert _rows(bound)==_rows(written)
+
+def test_select_star_drops_bound_variables(endpoint):
+    frame=endpoint.select(QUERIES["select star"],bindings=dict(person=EX.alice))
+    assert sorted(frame.columns)==["age","friend"]
+
+def test_order_by_is_kept(endpoint):
+    frame=endpoint.select(QUERIES["order by"],bindings=dict(limit=42))
+    assert frame["who"].tolist()==["ex:bob","ex:dave","ex:alice","ex:carol"]
+
+def test_ask(endpoint):
+    sparql="ASK { ?person ex:knows ?friend }"
+    for friend in ("bob","dave"):
+        bindings=dict(person=EX.alice,friend=EX[friend])
+        bound=endpoint.select_raw(sparql,bindings=bindings).askAnswer
+        assert bound==endpoint.select_raw(_written(sparql,bindings)).askAnswer
+        assert bound==(friend=="bob")
+
+def test_blank_node_binding():
+    # a blank node written into a pattern would act as a variable and match every subject
+    graph=Graph()
+    (first,second)=(BNode(),BNode())
+    graph.add((first,EX.value,Literal(1)))
+    graph.add((second,EX.value,Literal(2)))
+    graph.add((EX.named,EX.value,Literal(3)))
+    endpoint=LocalEndpoint(graph)
+    sparql="SELECT ?value { ?node <http://example.com/value> ?value }"
+    assert endpoint.select(sparql,bindings=dict(node=first))["value"].tolist()==[1]
+    assert endpoint.select(sparql,bindings=dict(node=second))["value"].tolist()==[2]
+    assert endpoint.select_raw("ASK { ?node <http://example.com/value> 3 }",bindings=dict(node=first)).askAnswer==False
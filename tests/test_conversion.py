@@ -0,0 +1,70 @@
+import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from rdflib import Graph, URIRef, Literal, Namespace, XSD
+
+from gastrodon import LocalEndpoint, GastrodonURI
+
+EX=Namespace("http://example.com/")
+
+@pytest.fixture
+def frame():
+    graph=Graph()
+    graph.bind("ex",EX)
+    for index in range(3):
+        row=EX["row%d" % index]
+        graph.add((row,EX.int,Literal(index)))
+        graph.add((row,EX.double,Literal(index+0.5,datatype=XSD.double)))
+        graph.add((row,EX.decimal,Literal(Decimal("%d.25" % index))))
+        graph.add((row,EX.boolean,Literal(index%2==0)))
+        graph.add((row,EX.date,Literal(datetime.date(2020,1,index+1))))
+        graph.add((row,EX.dateTime,Literal(datetime.datetime(2020,1,index+1,12,30))))
+        graph.add((row,EX.label,Literal("name %d" % index,lang="en")))
+        graph.add((row,EX.link,EX["target%d" % index]))
+    return LocalEndpoint(graph).select("""
+        SELECT ?row ?int ?double ?decimal ?boolean ?date ?dateTime ?label ?link {
+            ?row ex:int ?int ;
+                ex:double ?double ;
+                ex:decimal ?decimal ;
+                ex:boolean ?boolean ;
+                ex:date ?date ;
+                ex:dateTime ?dateTime ;
+                ex:label ?label ;
+                ex:link ?link .
+        } ORDER BY ?row
+    """)
+
+def test_int_column(frame):
+    assert pd.api.types.is_integer_dtype(frame["int"])
+    assert frame["int"].tolist()==[0,1,2]
+
+def test_double_column_is_not_truncated(frame):
+    assert pd.api.types.is_float_dtype(frame["double"])
+    assert frame["double"].tolist()==[0.5,1.5,2.5]
+
+def test_decimal_column_is_not_truncated(frame):
+    assert frame["decimal"].tolist()==[Decimal("0.25"),Decimal("1.25"),Decimal("2.25")]
+
+def test_boolean_column(frame):
+    assert pd.api.types.is_bool_dtype(frame["boolean"])
+    assert frame["boolean"].tolist()==[True,False,True]
+
+def test_date_column(frame):
+    assert frame["date"].tolist()==[datetime.date(2020,1,x) for x in (1,2,3)]
+
+def test_date_time_column(frame):
+    assert pd.api.types.is_datetime64_any_dtype(frame["dateTime"])
+    assert frame["dateTime"].tolist()==[pd.Timestamp(2020,1,x,12,30) for x in (1,2,3)]
+
+def test_language_tagged_column(frame):
+    assert pd.api.types.is_string_dtype(frame["label"])
+    assert frame["label"].tolist()==["name 0","name 1","name 2"]
+
+def test_uri_columns_hold_gastrodon_uris(frame):
+    for name in ("row","link"):
+        assert frame[name].dtype==object
+        assert all(isinstance(x,GastrodonURI) for x in frame[name])
+    assert frame["link"].tolist()==["ex:target0","ex:target1","ex:target2"]
+    assert frame["link"].iloc[0].to_uri_ref()==EX.target0
@@ -0,0 +1,57 @@
+from collections import Counter
+
+import pytest
+from rdflib import Graph, URIRef, BNode, Literal, RDF
+
+from gastrodon import LocalEndpoint, ArrayStore
+
+@pytest.fixture(params=["memory","array"])
+def containers(request):
+    graph=Graph() if request.param=="memory" else Graph(store=ArrayStore())
+    nodes=dict(
+        blank_seq=BNode(),
+        named_seq=URIRef("http://example.com/named_seq"),
+        blank_bag=BNode(),
+        other_seq=URIRef("http://example.com/other_seq")
+    )
+    contents=dict(
+        blank_seq=(RDF.Seq,[1,2,3]),
+        named_seq=(RDF.Seq,[4,5]),
+        blank_bag=(RDF.Bag,["a","a","b"]),
+        other_seq=(RDF.Seq,[6])
+    )
+    for (name,(kind,items)) in contents.items():
+        graph.add((nodes[name],RDF.type,kind))
+        for (index,item) in enumerate(items):
+            graph.add((nodes[name],RDF["_%d" % (index+1)],Literal(item)))
+    return (LocalEndpoint(graph),nodes)
+
+def test_decollect_blank_node(containers):
+    (endpoint,nodes)=containers
+    assert endpoint.decollect(nodes["blank_seq"])==[1,2,3]
+    assert endpoint.decollect(nodes["blank_bag"])==Counter(a=2,b=1)
+
+def test_decollect_many_mixes_blank_nodes_and_iris(containers):
+    (endpoint,nodes)=containers
+    assert endpoint.decollect_many(list(nodes.values()))=={
+        nodes["blank_seq"]:[1,2,3],
+        nodes["named_seq"]:[4,5],
+        nodes["blank_bag"]:Counter(a=2,b=1),
+        nodes["other_seq"]:[6]
+    }
+
+def test_decollect_many_one_iri_among_blank_nodes(containers):
+    (endpoint,nodes)=containers
+    wanted=[nodes["blank_seq"],nodes["named_seq"],nodes["blank_bag"]]
+    assert endpoint.decollect_many(wanted)=={
+        nodes["blank_seq"]:[1,2,3],
+        nodes["named_seq"]:[4,5],
+        nodes["blank_bag"]:Counter(a=2,b=1)
+    }
+
+def test_decollect_many_in_small_batches(containers):
+    (endpoint,nodes)=containers
+    found=endpoint.decollect_many(list(nodes.values()),batch_size=2)
+    assert found[nodes["named_seq"]]==[4,5]
+    assert found[nodes["other_seq"]]==[6]
+    assert found[nodes["blank_seq"]]==[1,2,3]
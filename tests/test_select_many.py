@@ -0,0 +1,31 @@
+import pytest
+from rdflib import Graph, Literal, Namespace
+
+from gastrodon import LocalEndpoint
+
+EX=Namespace("http://example.com/")
+
+@pytest.fixture
+def endpoint():
+    graph=Graph()
+    for index in range(6):
+        graph.add((EX["s%d" % (index%3)],EX.value,Literal(index)))
+        graph.add((EX["s%d" % (index%3)],EX.kind,Literal("odd" if index%2 else "even")))
+    return LocalEndpoint(graph)
+
+def test_rows_are_numbered_once(endpoint):
+    frame=endpoint.select_many("""
+        SELECT ?value { ?s <http://example.com/value> ?value } ORDER BY ?value
+    """,[dict(s=EX["s%d" % index]) for index in range(3)])
+    assert frame.index.tolist()==list(range(6))
+    assert frame["item"].tolist()==[0,0,1,1,2,2]
+    assert frame["value"].tolist()==[0,3,1,4,2,5]
+
+def test_group_index_is_kept(endpoint):
+    frame=endpoint.select_many("""
+        SELECT ?kind (COUNT(*) AS ?count) {
+            ?s <http://example.com/value> ?value ; <http://example.com/kind> ?kind
+        } GROUP BY ?kind
+    """,[dict(s=EX["s%d" % index]) for index in range(2)])
+    assert frame.index.name=="kind"
+    assert sorted(frame.index.tolist())==["even","even","odd","odd"]
@@ -0,0 +1,51 @@
+import pytest
+from rdflib import Graph, Literal, Namespace
+
+from gastrodon import LocalEndpoint
+
+EX=Namespace("http://example.com/")
+
+@pytest.fixture
+def endpoint():
+    graph=Graph()
+    graph.bind("ex",EX)
+    for index in range(47):
+        row=EX["row%03d" % index]
+        graph.add((row,EX.number,Literal(index)))
+        graph.add((row,EX.label,Literal("label %03d" % index,lang="en")))
+        graph.add((row,EX.group,Literal(index%5)))
+    return LocalEndpoint(graph)
+
+def test_page_by_int(endpoint):
+    frame=endpoint.select_paged("SELECT ?number { ?row ex:number ?number }","number",page_size=10)
+    assert frame["number"].tolist()==list(range(47))
+
+def test_page_by_iri(endpoint):
+    frame=endpoint.select_paged("SELECT ?row { ?row ex:number ?number }","row",page_size=10)
+    assert frame["row"].tolist()==["ex:row%03d" % x for x in range(47)]
+
+def test_page_by_language_tagged_string(endpoint):
+    frame=endpoint.select_paged("SELECT ?label { ?row ex:label ?label }","?label",page_size=10)
+    assert frame["label"].tolist()==["label %03d" % x for x in range(47)]
+
+def test_pages_one_at_a_time(endpoint):
+    pages=list(endpoint.select_paged("SELECT ?number { ?row ex:number ?number }","number",page_size=20,
+                                     prefetch=False,concat=False))
+    assert [len(x) for x in pages]==[20,20,7]
+
+def test_page_that_does_not_advance(endpoint):
+    # if the filter for the next page lets through the rows already seen,  the same page would come back forever
+    endpoint._page_filter=lambda key,value:"true"
+    with pytest.raises(ValueError):
+        endpoint.select_paged("SELECT ?number { ?row ex:number ?number }","number",page_size=10)
+
+@pytest.mark.parametrize("tail",["ORDER BY ?number","LIMIT 10","OFFSET 10"])
+def test_reject_own_order_or_slice(endpoint,tail):
+    with pytest.raises(ValueError):
+        endpoint.select_paged("SELECT ?number { ?row ex:number ?number } "+tail,"number")
+
+def test_reject_key_not_grouped(endpoint):
+    with pytest.raises(ValueError):
+        endpoint.select_paged("""
+            SELECT ?group (COUNT(*) AS ?count) { ?row ex:group ?group } GROUP BY ?group
+        ""","count")
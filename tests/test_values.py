@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+from rdflib import Graph, Literal, Namespace
+
+from gastrodon import LocalEndpoint
+
+EX=Namespace("http://example.com/")
+
+@pytest.fixture
+def endpoint():
+    graph=Graph()
+    graph.bind("ex",EX)
+    for index in range(10):
+        thing=EX["thing%d" % index]
+        graph.add((thing,EX.value,Literal(index)))
+        graph.add((thing,EX.kind,Literal("odd" if index%2 else "even")))
+    return LocalEndpoint(graph)
+
+SELECT_VALUE="SELECT ?_thing ?value { ?_thing ex:value ?value }"
+
+def _things(endpoint):
+    # a column of URIs from an earlier result,  as the values are usually taken
+    return endpoint.select("SELECT ?thing { ?thing ex:value ?value } ORDER BY ?value")["thing"]
+
+def test_list(endpoint):
+    frame=endpoint.select(SELECT_VALUE,bindings=dict(_thing=[EX.thing1,EX.thing3]))
+    assert sorted(frame["value"].tolist())==[1,3]
+
+def test_series(endpoint):
+    things=_things(endpoint)
+    frame=endpoint.select(SELECT_VALUE,bindings=dict(_thing=things[things.index%3==0]))
+    assert sorted(frame["value"].tolist())==[0,3,6,9]
+
+def test_missing_values_are_left_out_of_a_list(endpoint):
+    # UNDEF would match every thing
+    frame=endpoint.select("SELECT ?thing { ?thing ex:value ?_value }",bindings=dict(_value=[2,None,float("nan"),4]))
+    assert sorted(frame["thing"].tolist())==["ex:thing2","ex:thing4"]
+
+def test_data_frame_binds_each_column(endpoint):
+    rows=pd.DataFrame(dict(thing=_things(endpoint)[:4],kind=["even","even","odd","odd"]))
+    frame=endpoint.select("SELECT ?_thing ?value { ?_thing ex:value ?value ; ex:kind ?_kind }",
+                          bindings=dict(_thing=rows))
+    assert sorted(frame["value"].tolist())==[0,3]
+
+def test_missing_value_in_data_frame_is_undef(endpoint):
+    rows=pd.DataFrame(dict(thing=_things(endpoint)[:3],kind=["even",None,"even"]))
+    frame=endpoint.select("SELECT ?_thing ?value { ?_thing ex:value ?value ; ex:kind ?_kind }",
+                          bindings=dict(_thing=rows))
+    assert sorted(frame["value"].tolist())==[0,1,2]
+
+def test_data_frame_needs_column_for_variable(endpoint):
+    rows=pd.DataFrame(dict(item=_things(endpoint)[:3],kind=["even","odd","even"]))
+    with pytest.raises(ValueError):
+        endpoint.select("SELECT ?_thing ?value { ?_thing ex:value ?value ; ex:kind ?_kind }",
+                        bindings=dict(_thing=rows))
+
+def test_empty_list_matches_nothing(endpoint):
+    template=endpoint._prepare_query(SELECT_VALUE)
+    assert "FILTER(1 = 0)" in endpoint._substitute_arguments(template,dict(_thing=[]),endpoint.prefixes)
+    frame=endpoint.select(SELECT_VALUE,bindings=dict(_thing=[]))
+    assert len(frame)==0
+
+def test_values_are_split_into_batches(endpoint):
+    queries=[]
+    run=endpoint._run_select_frame
+    def counted(sparql,**kwargs):
+        queries.append(sparql)
+        return run(sparql,**kwargs)
+    endpoint._run_select_frame=counted
+    endpoint.values_batch_size=4
+    frame=endpoint.select(SELECT_VALUE,bindings=dict(_thing=_things(endpoint)))
+    assert len(queries)==3
+    assert frame.index.tolist()==list(range(10))
+    assert sorted(frame["value"].tolist())==list(range(10))